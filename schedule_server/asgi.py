@@ -7,10 +7,66 @@ For more information on this file, see
 https://docs.djangoproject.com/en/3.0/howto/deployment/asgi/
 """
 
+import asyncio
 import os
+from concurrent.futures import ThreadPoolExecutor
 
-from django.core.asgi import get_asgi_application
+import django
+from django.core.handlers.asgi import ASGIHandler
+from django.db import close_old_connections
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'schedule_server.settings')
 
+
+class ThreadPoolASGIHandler(ASGIHandler):
+    """
+    Runs the synchronous views in a pool of `ASGI_THREADS` threads, each with its own database
+    connection. Django 3.0 hands them to `sync_to_async`, which in current asgiref versions runs
+    every request of a worker in one thread, so concurrent reads would wait for each other.
+    Streaming responses, which may query the database as they are read, are read in the pool too.
+    """
+
+    def __init__(self, max_workers=None):
+        super().__init__()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='asgi')
+
+    async def get_response(self, request):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self.get_response_in_thread, request)
+
+    def get_response_in_thread(self, request):
+        close_old_connections()
+        try:
+            return super().get_response(request)
+        finally:
+            close_old_connections()
+
+    async def send_response(self, response, send):
+        if not response.streaming:
+            await super().send_response(response, send)
+            return
+        headers = [(header.encode('ascii'), value.encode('latin1')) for header, value in response.items()]
+        headers.extend((b'Set-Cookie', cookie.output(header='').encode('ascii').strip())
+                       for cookie in response.cookies.values())
+        await send({'type': 'http.response.start', 'status': response.status_code, 'headers': headers})
+        loop = asyncio.get_running_loop()
+        # one thread reads the whole response, as its queries may hold a cursor of that thread's connection
+        await loop.run_in_executor(self.executor, self.stream_in_thread, response, send, loop)
+        await send({'type': 'http.response.body'})
+
+    def stream_in_thread(self, response, send, loop):
+        try:
+            for part in response:
+                for chunk, _ in self.chunk_bytes(part):
+                    message = {'type': 'http.response.body', 'body': chunk, 'more_body': True}
+                    asyncio.run_coroutine_threadsafe(send(message), loop).result()
+        finally:
+            # closes the connection of this thread too, through the request_finished signal
+            response.close()
+
+
+def get_asgi_application():
+    django.setup(set_prefix=False)
+    return ThreadPoolASGIHandler(int(os.environ.get('ASGI_THREADS', 0)) or None)
+
+
 application = get_asgi_application()
@@ -0,0 +1,38 @@
+"""
+SQLite backend accepting the `init_command` and `transaction_mode` options of later Django versions.
+
+`init_command` holds statements, typically pragmas, run on every new connection. `transaction_mode`
+picks how transactions begin. With the default DEFERRED mode a transaction that reads before it
+writes fails with "database is locked" when another connection writes in between, without waiting
+for the busy timeout, while IMMEDIATE transactions take the write lock up front and queue for it.
+"""
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+TRANSACTION_MODES = ('DEFERRED', 'EXCLUSIVE', 'IMMEDIATE')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        self.init_command = kwargs.pop('init_command', None)
+        self.transaction_mode = kwargs.pop('transaction_mode', None)
+        if self.transaction_mode is not None and self.transaction_mode.upper() not in TRANSACTION_MODES:
+            raise ImproperlyConfigured(f"settings.DATABASES is improperly configured. 'transaction_mode' must be "
+                                       f"one of {', '.join(TRANSACTION_MODES)}.")
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        if self.init_command:
+            for statement in self.init_command.split(';'):
+                if statement.strip():
+                    conn.execute(statement)
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        if self.transaction_mode is None:
+            super()._start_transaction_under_autocommit()
+        else:
+            self.cursor().execute(f'BEGIN {self.transaction_mode.upper()}')
@@ -0,0 +1,104 @@
+"""
+Writes of many owned objects with a few queries, for imports.
+
+Bulk writes skip `save`, so the objects are stamped with versions here. On databases that
+do not return the keys of inserted rows, the keys are read back by their owners and versions.
+"""
+from django.db import connection, transaction
+from django.db.models import Q
+
+from schedule_server import caching, models
+
+
+def create_all(model, instances):
+    """Inserts `instances` of a synced model with one query and sets their keys."""
+    if not instances:
+        return instances
+    with transaction.atomic():
+        models.stamp_versions(instances)
+        model.objects.bulk_create(instances)
+        if not connection.features.can_return_rows_from_bulk_insert:
+            ranges = {}
+            for instance in instances:
+                first, last = ranges.get(instance.owner_id, (instance.version, instance.version))
+                ranges[instance.owner_id] = min(first, instance.version), max(last, instance.version)
+            query = Q(pk__in=[])
+            for owner_id, (first, last) in ranges.items():
+                query |= Q(owner_id=owner_id, version__gte=first, version__lte=last)
+            pks = {(owner_id, version): pk for owner_id, version, pk in
+                   model.objects.filter(query).values_list('owner_id', 'version', 'pk')}
+            for instance in instances:
+                instance.pk = pks[instance.owner_id, instance.version]
+    return instances
+
+
+def update_all(model, instances):
+    """Saves every field but the creation time of `instances` of a synced model."""
+    fields = [field.name for field in model._meta.concrete_fields if not field.primary_key and field.name != 'created']
+    with transaction.atomic():
+        models.stamp_versions(instances)
+        model.objects.bulk_update(instances, fields)
+    return instances
+
+
+class Resolver:
+    """
+    Resolves nested data of subjects, class types and teachers to objects of their owners by
+    the fields of their unique constraints, with upsert semantics: missing objects are created
+    and other given fields of existing ones updated. Resolved objects are cached, so resolving
+    any number of classes costs a few queries per model. Writes bump the versions of the
+    written resources for their owners.
+    """
+    NATURAL_KEYS = {models.Subject: 'title', models.ClassType: 'title', models.Teacher: 'name'}
+    RESOURCES = {models.Subject: 'subject', models.ClassType: 'class-type', models.Teacher: 'teacher'}
+
+    def __init__(self):
+        self.cache = {}
+
+    def resolve(self, model, lookups):
+        """The object for each (owner, field values) lookup."""
+        field = self.NATURAL_KEYS[model]
+        keys = [(model, owner.pk, values[field]) for owner, values in lookups]
+        missing = {}
+        for key, lookup in zip(keys, lookups):
+            if key not in self.cache:
+                missing.setdefault(key, lookup)
+        if missing:
+            self.fetch(model, missing)
+            # Rows inserted concurrently are ignored here and fetched with the new ones
+            created = [model(owner=owner, **values) for key, (owner, values) in missing.items()
+                       if key not in self.cache]
+            models.stamp_versions(created)
+            model.objects.bulk_create(created, ignore_conflicts=True)
+            self.fetch(model, [key for key in missing if key not in self.cache])
+            self.invalidate(model, created)
+
+        changed = {}
+        for key, (_, values) in zip(keys, lookups):
+            instance = self.cache[key]
+            for name, value in values.items():
+                if getattr(instance, name) != value:
+                    setattr(instance, name, value)
+                    changed[key] = instance
+        if changed:
+            update_all(model, list(changed.values()))
+            self.invalidate(model, changed.values())
+        return [self.cache[key] for key in keys]
+
+    def invalidate(self, model, instances):
+        for owner_id in {instance.owner_id for instance in instances}:
+            caching.bump_version(self.RESOURCES[model], owner_id)
+
+    def fetch(self, model, keys):
+        if not keys:
+            return
+        field = self.NATURAL_KEYS[model]
+        keys = set(keys)
+        instances = model.objects.filter(**{
+            'owner_id__in': {owner_id for _, owner_id, _ in keys},
+            f'{field}__in': {value for _, _, value in keys},
+        }).select_related('owner')
+        for instance in instances:
+            key = (model, instance.owner_id, getattr(instance, field))
+            if key in keys:
+                self.cache[key] = instance
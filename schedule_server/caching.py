@@ -0,0 +1,81 @@
+"""
+Per-user versions of the owned resources, and the caches and ETags built on them.
+
+Committed writes replace the version of the written resource for its owner and for all users,
+so whatever depends on it gets new cache keys and ETags. Stale entries are never read
+again and simply expire. Versions and cached schedules live in the `SCHEDULE_CACHE_ALIAS`
+entry of `CACHES`, which sets their backend, TTL and size.
+"""
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.http import quote_etag
+
+ALL_USERS = '*'
+
+# Resources whose writes change what a resource shows, including cascading deletes
+RESOURCE_DEPENDENCIES = {
+    'subject': ['subject'],
+    'teacher': ['teacher'],
+    'class-type': ['class-type'],
+    'class': ['class', 'subject', 'class-type', 'teacher'],
+    'time': ['time', 'class', 'subject'],
+    'task': ['task', 'class', 'subject'],
+    'schedule': ['subject', 'teacher', 'class-type', 'class', 'time'],
+    'day': ['subject', 'teacher', 'class-type', 'class', 'time', 'task'],
+}
+
+
+def get_cache():
+    return caches[settings.SCHEDULE_CACHE_ALIAS]
+
+
+def get_version_key(resource, user_id):
+    return f'version:{resource}:{user_id}'
+
+
+def get_hash(*parts):
+    return hashlib.sha1(':'.join(map(str, parts)).encode()).hexdigest()
+
+
+def bump_version(resource, user_id):
+    """
+    Replaces the versions once the current transaction commits, and not at all if it rolls back.
+    Bumped earlier, a read of the old rows before the commit would cache them under the new versions.
+    """
+    transaction.on_commit(lambda: set_version(resource, user_id))
+
+
+def set_version(resource, user_id):
+    # fresh versions rather than counters, so an evicted one cannot resurrect old entries
+    get_cache().set_many({get_version_key(resource, user_id): uuid.uuid4().hex,
+                          get_version_key(resource, ALL_USERS): uuid.uuid4().hex}, None)
+
+
+def get_version(resource, user_id=ALL_USERS):
+    """Version of everything the resource shows to a user, or to admins for all users."""
+    cache = get_cache()
+    keys = [get_version_key(dependency, user_id) for dependency in RESOURCE_DEPENDENCIES[resource]]
+    versions = cache.get_many(keys)
+    missing = {key: uuid.uuid4().hex for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return get_hash(*(versions[key] for key in keys))
+
+
+def get_etag(user_id, version, *parts):
+    return quote_etag(get_hash(user_id, version, *parts))
+
+
+def get_or_set_schedule(user_id, version, key, compute):
+    cache = get_cache()
+    key = f'schedule:{user_id}:{version}:{key}'
+    schedule = cache.get(key)
+    if schedule is None:
+        schedule = compute()
+        cache.set(key, schedule)
+    return schedule
@@ -0,0 +1,149 @@
+"""
+Overlaps between the occurrences of times, found over expanded occurrences sorted by start.
+
+All the conflicts of a user come from a sweep line: occurrences are visited by start, keeping the ones
+still running in a heap by end, so n occurrences with k overlaps take O((n + k) log n) rather than
+comparing every pair. The occurrences of a single time never overlap each other, which makes them
+ordered by end as well as by start, so whether a time collides with others is a binary search per
+occurrence of the others.
+"""
+import datetime
+import heapq
+from bisect import bisect_right
+from operator import itemgetter
+
+from django.db.models import F, Q
+
+from schedule_server import models
+from schedule_server.occurances import add_days, get_first_occurrence, get_time_occurrences
+
+# Days after its first occurrence over which an open-ended time is checked
+HORIZON_DAYS = 366
+
+
+def get_interval(date, time):
+    """Start and end of the occurrence of a `Time` on `date`, ending the next day if it runs past midnight."""
+    start = datetime.datetime.combine(date, time.time_start)
+    if time.time_end >= time.time_start:
+        return start, datetime.datetime.combine(date, time.time_end)
+    if date == datetime.date.max:
+        return start, datetime.datetime.max
+    return start, datetime.datetime.combine(date + datetime.timedelta(1), time.time_end)
+
+
+def get_intervals(times, date_from, date_to):
+    """(start, end, index in `times`) of every occurrence from `date_from` to `date_to`, sorted by start."""
+    intervals = [(*get_interval(date, time), index) for index, time in enumerate(times)
+                 for date in get_time_occurrences(time, date_from, date_to)]
+    intervals.sort(key=itemgetter(0))
+    return intervals
+
+
+def find_conflicts(times, date_from, date_to):
+    """
+    Pairs of indexes in `times` whose occurrences overlap from `date_from` to `date_to`,
+    with the date their first overlap starts.
+    """
+    running = []
+    conflicts = {}
+    for start, end, index in get_intervals(times, date_from, date_to):
+        while running and running[0][0] <= start:
+            heapq.heappop(running)
+        for _, other in running:
+            if other != index:
+                conflicts.setdefault((min(index, other), max(index, other)), start.date())
+        heapq.heappush(running, (end, index))
+    return conflicts
+
+
+def find_collisions(time, others, date_from, date_to):
+    """
+    Indexes in `others` with occurrences overlapping those of `time` from `date_from` to `date_to`,
+    with the date their first overlap starts.
+    """
+    intervals = get_intervals([time], date_from, date_to)
+    starts = [start for start, _, _ in intervals]
+    ends = [end for _, end, _ in intervals]
+    collisions = {}
+    for start, end, index in get_intervals(others, date_from, date_to):
+        # the first occurrence of `time` ending after this one starts is the only one that may overlap it
+        position = bisect_right(ends, start)
+        if position < len(intervals) and starts[position] < end:
+            collisions.setdefault(index, max(start, starts[position]).date())
+    return collisions
+
+
+def get_window(time):
+    """
+    The dates over which conflicts of a `Time` are checked, up to its end or over `HORIZON_DAYS`
+    if it has none, or None if it never occurs.
+    """
+    first = get_first_occurrence(time)
+    if first is None:
+        return None
+    return first, time.date_end if time.date_end is not None else add_days(first, HORIZON_DAYS - 1)
+
+
+def get_time_conflicts(time):
+    """[{'id', 'date'}] of the other times of the owner of `time` it overlaps, by the date of the first overlap."""
+    window = get_window(time)
+    if window is None:
+        return []
+    date_from, date_to = window
+    others = models.Time.objects.filter(
+        Q(owner_id=time.owner_id),
+        Q(date_start__lte=date_to),
+        Q(date_end__gte=date_from) | Q(date_end__isnull=True),
+    ).exclude(pk=time.pk)
+    if time.time_end >= time.time_start:
+        # only times of day overlapping this one, or running past midnight, may collide with it
+        others = others.filter(Q(time_start__lt=time.time_end, time_end__gt=time.time_start)
+                               | Q(time_end__lt=F('time_start')))
+    others = list(others)
+    collisions = find_collisions(time, others, date_from, date_to)
+    return [{'id': others[index].pk, 'date': date}
+            for index, date in sorted(collisions.items(), key=lambda item: (item[1], others[item[0]].pk))]
+
+
+def get_batch_conflicts(times):
+    """
+    [[{'id' or 'item', 'date'}]] for each of `times` written together, of the other times of its owner and the
+    indexes of the other items of `times` it overlaps, by the date of the first overlap. One sweep per owner
+    over the windows of their items checks the whole batch.
+    """
+    items = {time.pk: index for index, time in enumerate(times)}
+    windows = [get_window(time) for time in times]
+    collisions = [{} for _ in times]
+    for owner_id in {time.owner_id for time in times}:
+        owned = [window for time, window in zip(times, windows) if time.owner_id == owner_id and window is not None]
+        if not owned:
+            continue
+        date_from = min(start for start, _ in owned)
+        date_to = max(end for _, end in owned)
+        others = list(models.Time.objects.filter(
+            Q(owner_id=owner_id),
+            Q(date_start__lte=date_to),
+            Q(date_end__gte=date_from) | Q(date_end__isnull=True),
+        ).order_by('pk'))
+        for (first, second), date in find_conflicts(others, date_from, date_to).items():
+            for time, other in ((others[first], others[second]), (others[second], others[first])):
+                index = items.get(time.pk)
+                # the sweep spans the windows of all the items, so overlaps past the window of this one are skipped
+                if index is not None and date <= windows[index][1]:
+                    key = ('item', items[other.pk]) if other.pk in items else ('id', other.pk)
+                    collisions[index].setdefault(key, date)
+    return [[{name: value, 'date': date}
+             for (name, value), date in sorted(item.items(), key=lambda entry: (entry[1], entry[0]))]
+            for item in collisions]
+
+
+def get_user_conflicts(user_id, date_from, date_to):
+    """[{'times', 'date'}] of the pairs of times of a user overlapping from `date_from` to `date_to`."""
+    times = list(models.Time.objects.filter(
+        Q(owner_id=user_id),
+        Q(date_start__lte=date_to),
+        Q(date_end__gte=date_from) | Q(date_end__isnull=True),
+    ).order_by('pk'))
+    conflicts = find_conflicts(times, date_from, date_to)
+    return [{'times': [times[first].pk, times[second].pk], 'date': date}
+            for (first, second), date in sorted(conflicts.items(), key=lambda item: (item[1], item[0]))]
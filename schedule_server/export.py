@@ -0,0 +1,38 @@
+"""
+Exports of whole querysets streamed as JSON or NDJSON.
+
+Rows are fetched with `iterator`, which uses server-side cursors where the database has them,
+and rendered a chunk at a time, so memory stays flat however many rows there are.
+"""
+import json
+from itertools import islice
+
+from rest_framework.utils import encoders
+
+CHUNK_SIZE = 2000
+
+
+def render(item):
+    """`item` in the compact form DRF's JSONRenderer gives it."""
+    return json.dumps(item, cls=encoders.JSONEncoder, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+def get_chunks(queryset, to_representation):
+    objects = queryset.iterator(chunk_size=CHUNK_SIZE)
+    while True:
+        chunk = [render(to_representation(instance)) for instance in islice(objects, CHUNK_SIZE)]
+        if not chunk:
+            return
+        yield chunk
+
+
+def stream(queryset, to_representation, lines=False):
+    """Chunks of a JSON array of the representations of objects, or of one per line."""
+    if lines:
+        for chunk in get_chunks(queryset, to_representation):
+            yield b''.join(item + b'\n' for item in chunk)
+        return
+    yield b'['
+    for index, chunk in enumerate(get_chunks(queryset, to_representation)):
+        yield (b',' if index else b'') + b','.join(chunk)
+    yield b']'
@@ -0,0 +1,87 @@
+"""
+Free time between the classes of a user, for planning study.
+
+The occurrences over a range are merged into disjoint busy intervals in one pass over them sorted
+by start, which is then walked together with the days, so a whole semester costs one sort of its
+occurrences rather than a schedule per day.
+"""
+import datetime
+
+from django.db.models import Q
+
+from schedule_server import materialization, models
+from schedule_server.occurances import get_time_occurrences
+
+DAY_START = datetime.time(8)
+DAY_END = datetime.time(22)
+MIN_MINUTES = 30
+
+
+def get_occurrences(user_id, date_from, date_to):
+    """(date, time_start, time_end) of the user's occurrences, materialized or expanded from their times."""
+    if materialization.get_window(user_id, date_from, date_to) is not None:
+        return models.Occurrence.objects.filter(
+            owner_id=user_id, date__gte=date_from, date__lte=date_to
+        ).values_list('date', 'time_start', 'time_end')
+    times = models.Time.objects.filter(
+        Q(owner_id=user_id),
+        Q(date_start__lte=date_to),
+        Q(date_end__gte=date_from) | Q(date_end__isnull=True)
+    )
+    return [(date, time.time_start, time.time_end)
+            for time in times for date in get_time_occurrences(time, date_from, date_to)]
+
+
+def get_busy_intervals(occurrences):
+    """Sorted disjoint (start, end) intervals covering the occurrences, which end the next day past midnight."""
+    intervals = []
+    for date, time_start, time_end in occurrences:
+        end_date = date if time_end >= time_start else date + datetime.timedelta(1)
+        intervals.append((datetime.datetime.combine(date, time_start), datetime.datetime.combine(end_date, time_end)))
+    intervals.sort()
+
+    merged = []
+    for start, end in intervals:
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def find_free_slots(busy, date_from, date_to, day_start=DAY_START, day_end=DAY_END, min_minutes=MIN_MINUTES):
+    """
+    Gaps of at least `min_minutes` between `day_start` and `day_end` of every date from `date_from` to `date_to`
+    that no interval of `busy`, as `get_busy_intervals` gives them, covers.
+    """
+    min_duration = datetime.timedelta(minutes=min_minutes)
+    slots = []
+    position = 0
+    for offset in range((date_to - date_from).days + 1):
+        date = date_from + datetime.timedelta(offset)
+        cursor = datetime.datetime.combine(date, day_start)
+        bound = datetime.datetime.combine(date, day_end)
+        while position < len(busy) and busy[position][1] <= cursor:
+            position += 1
+        # intervals may last past the bound and into the next day, so only skipped ones are left behind
+        index = position
+        while index < len(busy) and busy[index][0] < bound:
+            start, end = busy[index]
+            if start - cursor >= min_duration:
+                slots.append(build_slot(date, cursor, start))
+            cursor = max(cursor, end)
+            index += 1
+        if bound - cursor >= min_duration:
+            slots.append(build_slot(date, cursor, bound))
+    return slots
+
+
+def build_slot(date, start, end):
+    return {'date': date, 'time_start': start.time(), 'time_end': end.time(),
+            'minutes': int((end - start).total_seconds()) // 60}
+
+
+def get_free_slots(user_id, date_from, date_to, day_start=DAY_START, day_end=DAY_END, min_minutes=MIN_MINUTES):
+    """Free slots of a user, counting classes of the day before `date_from` that last past midnight."""
+    occurrences = get_occurrences(user_id, date_from - datetime.timedelta(1), date_to)
+    return find_free_slots(get_busy_intervals(occurrences), date_from, date_to, day_start, day_end, min_minutes)
@@ -0,0 +1,140 @@
+"""
+iCalendar (RFC 5545) feeds of schedules, for calendar apps to subscribe to.
+
+Every `Time` becomes one event recurring by an RRULE rather than a list of occurrences, so a feed
+stays as small as the timetable however long its times last. Times are floating local times, as
+classes happen at the same wall clock time wherever the calendar is.
+"""
+import datetime
+from itertools import islice
+from math import gcd
+
+from django.utils import timezone
+from rest_framework import renderers
+
+from schedule_server import export
+from schedule_server.occurances import DAYS_IN_WEEK, get_first_occurrence, get_weekdays
+
+WEEKDAYS = ['MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU']
+
+# How often calendar apps should fetch the feed again, RFC 7986 and its older vendor equivalent
+REFRESH_INTERVAL = 'PT6H'
+
+HEADER = [
+    'BEGIN:VCALENDAR',
+    'VERSION:2.0',
+    'PRODID:-//schedule_server//Schedule//EN',
+    'CALSCALE:GREGORIAN',
+    'METHOD:PUBLISH',
+    f'REFRESH-INTERVAL;VALUE=DURATION:{REFRESH_INTERVAL}',
+    f'X-PUBLISHED-TTL:{REFRESH_INTERVAL}',
+]
+
+FOOTER = ['END:VCALENDAR']
+
+MAX_LINE_OCTETS = 75
+
+
+class ICalendarRenderer(renderers.BaseRenderer):
+    """Negotiates `text/calendar` for feeds, which stream their own content, and renders their errors."""
+    media_type = 'text/calendar'
+    format = 'ics'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return export.render(data)
+
+
+def escape(text):
+    return (text.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+            .replace('\r\n', '\\n').replace('\n', '\\n'))
+
+
+def fold(line):
+    """`line` split into lines of at most 75 octets, continued lines starting with a space."""
+    encoded = line.encode()
+    if len(encoded) <= MAX_LINE_OCTETS:
+        return encoded + b'\r\n'
+    parts = []
+    start, limit = 0, MAX_LINE_OCTETS
+    while start < len(encoded):
+        end = min(start + limit, len(encoded))
+        # never split a UTF-8 sequence, whose continuation bytes are 0b10xxxxxx
+        while end < len(encoded) and encoded[end] & 0xC0 == 0x80:
+            end -= 1
+        parts.append(encoded[start:end])
+        start, limit = end, MAX_LINE_OCTETS - 1
+    return b'\r\n '.join(parts) + b'\r\n'
+
+
+def render_lines(lines):
+    return b''.join(fold(line) for line in lines)
+
+
+def format_date_time(date, time):
+    return f'{date:%Y%m%d}T{time:%H%M%S}'
+
+
+def format_utc(value):
+    return f'{timezone.localtime(value, datetime.timezone.utc):%Y%m%dT%H%M%SZ}'
+
+
+def get_rrule(time):
+    """The recurrence rule of a `Time` as `occurances.get_time_occurrences` expands it, or None if it is single."""
+    if not time.period:
+        return None
+    weekdays = get_weekdays(time.weekdays)
+    if time.period < DAYS_IN_WEEK:
+        parts = ['FREQ=DAILY', f'INTERVAL={time.period}']
+    else:
+        # each weekday recurs from the week of the start, every lcm(period, 7) days
+        parts = ['FREQ=WEEKLY', f'INTERVAL={time.period // gcd(time.period, DAYS_IN_WEEK)}', 'WKST=MO']
+        if weekdays is None:
+            weekdays = range(1, DAYS_IN_WEEK + 1)
+    if weekdays is not None:
+        parts.append('BYDAY=' + ','.join(WEEKDAYS[weekday - 1] for weekday in weekdays))
+    if time.date_end is not None:
+        parts.append(f'UNTIL={format_date_time(time.date_end, time.time_start)}')
+    return ';'.join(parts)
+
+
+def get_event_lines(time, domain):
+    """Lines of the event of a `Time` with its class, subject, type and teacher loaded, or [] if it never occurs."""
+    first = get_first_occurrence(time)
+    if first is None:
+        return []
+    class_ = getattr(time, 'class')
+    end = first if time.time_end >= time.time_start else first + datetime.timedelta(1)
+    lines = [
+        'BEGIN:VEVENT',
+        f'UID:time-{time.pk}@{domain}',
+        f'DTSTAMP:{format_utc(time.updated)}',
+        f'LAST-MODIFIED:{format_utc(time.updated)}',
+        f'DTSTART:{format_date_time(first, time.time_start)}',
+        f'DTEND:{format_date_time(end, time.time_end)}',
+    ]
+    rrule = get_rrule(time)
+    if rrule is not None:
+        lines.append(f'RRULE:{rrule}')
+    lines.append(f'SUMMARY:{escape(class_.subject.title)}')
+    if class_.location:
+        lines.append(f'LOCATION:{escape(class_.location)}')
+    description = [text for text in (class_.type and class_.type.title, class_.teacher and class_.teacher.name) if text]
+    if description:
+        lines.append('DESCRIPTION:' + escape('\n'.join(description)))
+    lines.append('END:VEVENT')
+    return lines
+
+
+def stream(times, domain):
+    """Chunks of a calendar with an event for each of `times`, rendered as the rows are read."""
+    yield render_lines(HEADER)
+    objects = times.iterator(chunk_size=export.CHUNK_SIZE)
+    while True:
+        chunk = [render_lines(get_event_lines(time, domain)) for time in islice(objects, export.CHUNK_SIZE)]
+        if not chunk:
+            break
+        yield b''.join(chunk)
+    yield render_lines(FOOTER)
@@ -0,0 +1,58 @@
+"""Helpers shared by the benchmark commands."""
+import datetime
+import random
+import time
+from contextlib import contextmanager
+
+from django.contrib.auth.models import User
+from django.db import connection
+
+from schedule_server import models
+
+
+@contextmanager
+def scratch_database():
+    """A throwaway migrated database, like the one tests run against, used instead of the default one."""
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def seed(users, times_per_user, seed=0):
+    """Users with a class per time and weekly or biweekly times spread over a year."""
+    rng = random.Random(seed)
+    owners = User.objects.bulk_create([User(username=f'user{i}') for i in range(users)])
+    if owners[0].pk is None:
+        owners = list(User.objects.order_by('id'))
+
+    for owner in owners:
+        subject = models.Subject.objects.create(owner=owner, title='Subject', color='000000')
+        class_type = models.ClassType.objects.create(owner=owner, title='Lecture')
+        teacher = models.Teacher.objects.create(owner=owner, name='Teacher')
+        models.Class.objects.bulk_create([models.Class(owner=owner, subject=subject, type=class_type, teacher=teacher)
+                                          for _ in range(times_per_user)])
+    classes = list(models.Class.objects.order_by('id').values_list('id', 'owner_id'))
+
+    times = []
+    for class_id, owner_id in classes:
+        date_start = datetime.date(2020, 1, 1) + datetime.timedelta(rng.randrange(365))
+        hour = rng.randrange(8, 20)
+        times.append(models.Time(class_id=class_id, owner_id=owner_id, period=rng.choice([7, 14]),
+                                 weekdays=1 << rng.randrange(7), date_start=date_start,
+                                 date_end=date_start + datetime.timedelta(rng.randrange(30, 180)),
+                                 time_start=datetime.time(hour), time_end=datetime.time(hour + 1, 30)))
+    models.Time.objects.bulk_create(times)
+    return owners
+
+
+def measure(function, repeat):
+    """Best wall time of `repeat` calls, in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return min(timings) * 1000
@@ -0,0 +1,50 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+
+from schedule_server import conflicts, models
+from schedule_server.management.benchmark import measure, scratch_database, seed
+from schedule_server.occurances import get_time_occurrences
+
+DATE_FROM = datetime.date(2020, 1, 1)
+DATE_TO = datetime.date(2020, 12, 31)
+
+
+def pairwise_conflicts(times, date_from, date_to):
+    """Conflicts as `conflicts.find_conflicts` finds them, comparing the occurrences of every pair of times."""
+    occurrences = [[conflicts.get_interval(date, time) for date in get_time_occurrences(time, date_from, date_to)]
+                   for time in times]
+    found = {}
+    for first in range(len(times)):
+        for second in range(first + 1, len(times)):
+            overlaps = [max(start, other_start).date() for start, end in occurrences[first]
+                        for other_start, other_end in occurrences[second] if start < other_end and other_start < end]
+            if overlaps:
+                found[first, second] = min(overlaps)
+    return found
+
+
+class Command(BaseCommand):
+    help = 'Compares finding the overlapping times of a user pairwise and with a sweep line'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--times', type=int, default=300)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            seed(1, options['times'])
+            times = list(models.Time.objects.order_by('pk'))
+
+            found = conflicts.find_conflicts(times, DATE_FROM, DATE_TO)
+            if pairwise_conflicts(times, DATE_FROM, DATE_TO) != found:
+                self.stderr.write(self.style.ERROR('Conflicts differ'))
+                return
+
+            pairwise = measure(lambda: pairwise_conflicts(times, DATE_FROM, DATE_TO), options['repeat'])
+            sweep = measure(lambda: conflicts.find_conflicts(times, DATE_FROM, DATE_TO), options['repeat'])
+            collisions = measure(lambda: conflicts.get_time_conflicts(times[0]), options['repeat'])
+            self.stdout.write(f'{len(times)} times, {len(found)} overlapping pairs')
+            self.stdout.write(f'pairwise: {pairwise:.3f} ms')
+            self.stdout.write(f'sweep line: {sweep:.3f} ms ({pairwise / sweep:.1f}x)')
+            self.stdout.write(f'checking one time with its query: {collisions:.3f} ms')
@@ -0,0 +1,43 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+
+from schedule_server import free_time, views
+from schedule_server.management.benchmark import measure, scratch_database, seed
+
+DATE_FROM = datetime.date(2020, 2, 1)
+DATE_TO = datetime.date(2020, 7, 31)
+
+
+def get_free_slots_by_day(user_id):
+    """Free slots as the study planner found them, from the schedule of every date in turn."""
+    slots = []
+    for offset in range((DATE_TO - DATE_FROM).days + 1):
+        date = DATE_FROM + datetime.timedelta(offset)
+        occurrences = [(date, datetime.time.fromisoformat(item['time_start']),
+                        datetime.time.fromisoformat(item['time_end'])) for item in views.get_schedule(user_id, date)]
+        slots.extend(free_time.find_free_slots(free_time.get_busy_intervals(occurrences), date, date))
+    return slots
+
+
+class Command(BaseCommand):
+    help = 'Compares finding a semester of free slots from the schedule of every day and in one sweep'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--times', type=int, default=40)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            user_id = seed(1, options['times'])[0].id
+
+            slots = free_time.get_free_slots(user_id, DATE_FROM, DATE_TO)
+            if get_free_slots_by_day(user_id) != slots:
+                self.stderr.write(self.style.ERROR('Free slots differ'))
+                return
+
+            by_day = measure(lambda: get_free_slots_by_day(user_id), options['repeat'])
+            sweep = measure(lambda: free_time.get_free_slots(user_id, DATE_FROM, DATE_TO), options['repeat'])
+            self.stdout.write(f'{options["times"]} times, {len(slots)} free slots from {DATE_FROM} to {DATE_TO}')
+            self.stdout.write(f'schedule of every day: {by_day:.3f} ms')
+            self.stdout.write(f'one sweep: {sweep:.3f} ms ({by_day / sweep:.1f}x)')
@@ -0,0 +1,61 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import F, Q
+
+from schedule_server import models
+from schedule_server.management.benchmark import measure, scratch_database, seed
+
+INDEXED_MODELS = [models.Subject, models.Teacher, models.Time, models.Task]
+
+
+class Command(BaseCommand):
+    help = 'Shows query plans and timings of the schedule and list queries with and without the indexes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--times-per-user', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            owners = seed(options['users'], options['times_per_user'])
+            self.stdout.write(f'Seeded {models.Time.objects.count()} times for {len(owners)} users')
+            queries = self.get_queries(owners[len(owners) // 2].id)
+
+            indexes = [(model, index) for model in INDEXED_MODELS for index in model._meta.indexes]
+            with connection.schema_editor() as editor:
+                for model, index in indexes:
+                    editor.remove_index(model, index)
+            self.report('Before', queries, options['repeat'])
+
+            with connection.schema_editor() as editor:
+                for model, index in indexes:
+                    editor.add_index(model, index)
+            self.report('After', queries, options['repeat'])
+
+    @staticmethod
+    def get_queries(user_id):
+        date = datetime.date(2020, 6, 1)
+        return {
+            'schedule': models.Time.objects.annotate(
+                on_weekday=F('weekdays').bitand(1 << date.weekday())
+            ).filter(
+                Q(owner_id=user_id),
+                Q(date_start__lte=date),
+                Q(date_end__gte=date) | Q(date_end__isnull=True),
+                Q(on_weekday__gt=0) | Q(weekdays__isnull=True)
+            ),
+            'times': models.Time.objects.filter(owner_id=user_id),
+            'tasks': models.Task.objects.filter(owner_id=user_id),
+            'subjects': models.Subject.objects.filter(owner_id=user_id),
+            'teachers': models.Teacher.objects.filter(owner_id=user_id),
+        }
+
+    def report(self, title, queries, repeat):
+        self.stdout.write(self.style.MIGRATE_HEADING(title))
+        for name, queryset in queries.items():
+            timing = measure(lambda: list(queryset.all()), repeat)
+            self.stdout.write(f'{name}: {timing:.3f} ms')
+            self.stdout.write('    ' + queryset.explain().replace('\n', '\n    '))
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from schedule_server import models, serializers, views
+from schedule_server.management.benchmark import measure, scratch_database, seed
+
+
+def build_serialized_item(time):
+    """A schedule item built by the serializers, as the schedule views did before."""
+    item = dict(serializers.ClassSerializer(getattr(time, 'class')).data)
+    time_data = serializers.TimeSerializer(time).data
+    item['time_start'] = time_data['time_start']
+    item['time_end'] = time_data['time_end']
+    return item
+
+
+def build_item(time):
+    return views.build_schedule_item(views.CLASS_REPRESENTATION(getattr(time, 'class')), time)
+
+
+class Command(BaseCommand):
+    help = 'Compares building schedule items with the serializers and with the compiled representations'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            seed(1, options['items'])
+            times = list(models.Time.objects.select_related(*views.SCHEDULE_RELATED_FIELDS))
+
+            renderer = JSONRenderer()
+            if renderer.render([build_serialized_item(time) for time in times]) != \
+                    renderer.render([build_item(time) for time in times]):
+                self.stderr.write(self.style.ERROR('Rendered items differ'))
+                return
+
+            serialized = measure(lambda: [build_serialized_item(time) for time in times], options['repeat'])
+            compiled = measure(lambda: [build_item(time) for time in times], options['repeat'])
+            self.stdout.write(f'{len(times)} items')
+            self.stdout.write(f'serializers: {serialized:.3f} ms')
+            self.stdout.write(f'compiled: {compiled:.3f} ms ({serialized / compiled:.1f}x)')
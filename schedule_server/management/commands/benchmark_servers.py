@@ -0,0 +1,109 @@
+import asyncio
+import io
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.db.backends.signals import connection_created
+from django.test import Client
+
+from schedule_server import caching
+from schedule_server.asgi import ThreadPoolASGIHandler
+from schedule_server.management.benchmark import scratch_database, seed
+
+PATHS = [f'/schedule/2020-{month:02}-{day:02}/' for month in range(1, 13) for day in range(1, 29)]
+
+
+def call_wsgi(application, path, cookie):
+    environ = {
+        'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': '', 'SCRIPT_NAME': '',
+        'SERVER_NAME': 'localhost', 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': 'localhost', 'HTTP_COOKIE': cookie, 'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr,
+        'wsgi.url_scheme': 'http', 'wsgi.multithread': True, 'wsgi.multiprocess': False, 'wsgi.run_once': False,
+    }
+    statuses = []
+    response = application(environ, lambda status, headers: statuses.append(int(status.split()[0])))
+    b''.join(response)
+    response.close()
+    return statuses[0]
+
+
+async def call_asgi(application, path, cookie):
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+        'path': path, 'raw_path': path.encode(), 'query_string': b'', 'root_path': '',
+        'headers': [(b'host', b'localhost'), (b'cookie', cookie.encode())],
+        'client': ('127.0.0.1', 0), 'server': ('localhost', 80),
+    }
+    statuses = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            statuses.append(message['status'])
+
+    await application(scope, receive, send)
+    return statuses[0]
+
+
+class Command(BaseCommand):
+    help = 'Compares schedule read throughput of the WSGI and ASGI handlers under concurrent requests'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--times', type=int, default=100)
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument('--latency', type=float, default=1,
+                            help='Milliseconds added to every query, like the round trip to a database server')
+
+    def handle(self, *args, **options):
+        latency = options['latency'] / 1000
+
+        def delay(execute, sql, params, many, context):
+            time.sleep(latency)
+            return execute(sql, params, many, context)
+
+        def add_latency(sender, connection, **kwargs):
+            connection.execute_wrappers.append(delay)
+
+        with scratch_database():
+            owner = seed(1, options['times'])[0]
+            owner.set_password('password')
+            owner.save()
+            client = Client()
+            client.login(username=owner.username, password='password')
+            cookie = f'sessionid={client.cookies["sessionid"].value}'
+            paths = [PATHS[i % len(PATHS)] for i in range(options['requests'])]
+            concurrency = options['concurrency']
+            connection_created.connect(add_latency)
+
+            def run_wsgi():
+                application = WSGIHandler()
+                with ThreadPoolExecutor(concurrency) as executor:
+                    return list(executor.map(lambda path: call_wsgi(application, path, cookie), paths))
+
+            def run_asgi(application):
+                async def run():
+                    semaphore = asyncio.Semaphore(concurrency)
+
+                    async def call(path):
+                        async with semaphore:
+                            return await call_asgi(application, path, cookie)
+                    return await asyncio.gather(*[call(path) for path in paths])
+                return asyncio.run(run())
+
+            for name, run in (('WSGI, thread per request', run_wsgi),
+                              ('ASGI, Django handler', lambda: run_asgi(ASGIHandler())),
+                              ('ASGI, thread pool handler', lambda: run_asgi(ThreadPoolASGIHandler(concurrency)))):
+                caching.get_cache().clear()
+                started = time.perf_counter()
+                statuses = run()
+                elapsed = time.perf_counter() - started
+                if set(statuses) != {200}:
+                    self.stderr.write(self.style.ERROR(f'{name}: unexpected statuses {sorted(set(statuses))}'))
+                self.stdout.write(f'{name}: {len(paths) / elapsed:.0f} requests/s')
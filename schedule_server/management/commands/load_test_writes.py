@@ -0,0 +1,69 @@
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections, transaction
+
+from schedule_server import models
+
+# Options of Django's own SQLite backend, against the ones of the settings' SQLite profile
+PROFILES = [
+    ('default SQLite', {}),
+    ('tuned SQLite', None),
+]
+
+
+def write(owner, worker, writes):
+    """Creates subjects one transaction at a time, after reading the owner's count like a validation would."""
+    errors = 0
+    try:
+        for i in range(writes):
+            try:
+                with transaction.atomic():
+                    models.Subject.objects.filter(owner=owner).count()
+                    models.Subject.objects.create(owner=owner, title=f'Subject {worker}-{i}', color='000000')
+            except OperationalError:
+                errors += 1
+    finally:
+        connection.close()
+    return errors
+
+
+class Command(BaseCommand):
+    help = 'Runs concurrent writers against a database file with the default and tuned SQLite profiles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=16)
+        parser.add_argument('--writes', type=int, default=50, help='Transactions of every writer')
+
+    def handle(self, *args, **options):
+        settings_dict = connection.settings_dict
+        if settings_dict['ENGINE'] != 'schedule_server.backends.sqlite3':
+            raise CommandError('Run with the sqlite database profile')
+        old_name, old_options = settings_dict['NAME'], settings_dict['OPTIONS']
+        writers, writes = options['writers'], options['writes']
+        try:
+            for name, profile_options in PROFILES:
+                with tempfile.TemporaryDirectory() as directory:
+                    connections.close_all()
+                    settings_dict['NAME'] = os.path.join(directory, 'db.sqlite3')
+                    settings_dict['OPTIONS'] = old_options if profile_options is None else profile_options
+                    call_command('migrate', verbosity=0)
+                    owner = User.objects.create(username='user')
+                    connection.close()
+
+                    started = time.perf_counter()
+                    with ThreadPoolExecutor(writers) as executor:
+                        errors = sum(executor.map(lambda worker: write(owner, worker, writes), range(writers)))
+                    elapsed = time.perf_counter() - started
+                    written = models.Subject.objects.count()
+                    connection.close()
+                    self.stdout.write(f'{name}: {written} of {writers * writes} writes in {elapsed:.2f} s, '
+                                      f'{written / elapsed:.0f} writes/s, {errors} "database is locked" errors')
+        finally:
+            connections.close_all()
+            settings_dict['NAME'], settings_dict['OPTIONS'] = old_name, old_options
@@ -0,0 +1,72 @@
+"""
+Materialized occurrences of every user's times over a rolling horizon around today.
+
+A user's window is (re)built lazily the first time a schedule inside the horizon is requested
+and kept up to date by the views that write times. Deleting a time or its class cascades
+to its occurrences, and class data is joined at read time, so only time writes need a refresh.
+"""
+import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from schedule_server import models
+from schedule_server.occurances import get_time_occurrences
+
+
+def get_horizon():
+    today = timezone.localdate()
+    return (today - datetime.timedelta(settings.SCHEDULE_OCCURRENCES_DAYS_BEFORE),
+            today + datetime.timedelta(settings.SCHEDULE_OCCURRENCES_DAYS_AFTER))
+
+
+def build_occurrences(time, date_from, date_to):
+    return [models.Occurrence(owner_id=time.owner_id, date=date, time=time,
+                              time_start=time.time_start, time_end=time.time_end)
+            for date in get_time_occurrences(time, date_from, date_to)]
+
+
+def rebuild_window(user_id):
+    date_from, date_to = get_horizon()
+    times = models.Time.objects.filter(
+        Q(owner_id=user_id),
+        Q(date_start__lte=date_to),
+        Q(date_end__gte=date_from) | Q(date_end__isnull=True)
+    )
+    with transaction.atomic():
+        models.Occurrence.objects.filter(owner_id=user_id).delete()
+        models.Occurrence.objects.bulk_create(
+            [occurrence for time in times for occurrence in build_occurrences(time, date_from, date_to)],
+            ignore_conflicts=True)
+        window, _ = models.OccurrenceWindow.objects.update_or_create(
+            owner_id=user_id, defaults=dict(date_from=date_from, date_to=date_to))
+    return window
+
+
+def get_window(user_id, date_from, date_to):
+    """
+    The user's materialized window covering the dates, rebuilding it if it went stale,
+    or None if the dates lie beyond the horizon.
+    """
+    horizon_from, horizon_to = get_horizon()
+    if date_from < horizon_from or date_to > horizon_to:
+        return None
+    window = models.OccurrenceWindow.objects.filter(owner_id=user_id).first()
+    if window is not None and window.date_from <= date_from and date_to <= window.date_to:
+        return window
+    return rebuild_window(user_id)
+
+
+def refresh_times(times):
+    """Rematerialize the occurrences of created or updated times within their owners' windows."""
+    with transaction.atomic():
+        models.Occurrence.objects.filter(time__in=times).delete()
+        windows = models.OccurrenceWindow.objects.filter(owner_id__in={time.owner_id for time in times})
+        windows = {window.owner_id: window for window in windows}
+        models.Occurrence.objects.bulk_create(
+            [occurrence for time in times if time.owner_id in windows
+             for occurrence in build_occurrences(time, windows[time.owner_id].date_from,
+                                                 windows[time.owner_id].date_to)],
+            ignore_conflicts=True)
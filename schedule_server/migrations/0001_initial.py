@@ -0,0 +1,126 @@
+# Generated by Django 3.0.6 on 2026-10-17 02:24
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Class',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('location', models.CharField(default='', max_length=1000)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='classes', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Time',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('period', models.CharField(max_length=100, null=True)),
+                ('days_of_week', models.CharField(max_length=100, null=True)),
+                ('date_start', models.DateField(null=True)),
+                ('date_end', models.DateField(null=True)),
+                ('time_start', models.TimeField()),
+                ('time_end', models.TimeField()),
+                ('class', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='schedule_server.Class')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='times', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['time_start'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Teacher',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('name', models.CharField(max_length=100)),
+                ('phone', models.CharField(default='', max_length=100)),
+                ('email', models.CharField(default='', max_length=1000)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='teachers', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['created'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Task',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('title', models.CharField(max_length=100)),
+                ('description', models.CharField(max_length=100, null=True)),
+                ('priority', models.IntegerField(choices=[(0, 'none'), (1, 'low'), (2, 'medium'), (3, 'high')], default=0)),
+                ('is_completed', models.BooleanField(default=False)),
+                ('due_date', models.CharField(max_length=100, null=True)),
+                ('completed_at', models.CharField(max_length=100, null=True)),
+                ('class', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='schedule_server.Class')),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tasks', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-due_date'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Subject',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('title', models.CharField(max_length=100)),
+                ('color', models.CharField(max_length=6)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='subjects', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['created'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ClassType',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('title', models.CharField(max_length=100)),
+                ('is_custom', models.BooleanField(default=True)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='class_types', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='class',
+            name='subject',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='schedule_server.Subject'),
+        ),
+        migrations.AddField(
+            model_name='class',
+            name='teacher',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='schedule_server.Teacher'),
+        ),
+        migrations.AddField(
+            model_name='class',
+            name='type',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='schedule_server.ClassType'),
+        ),
+        migrations.AddConstraint(
+            model_name='teacher',
+            constraint=models.UniqueConstraint(fields=('owner', 'name'), name='unique_teacher_name_per_user'),
+        ),
+        migrations.AddConstraint(
+            model_name='subject',
+            constraint=models.UniqueConstraint(fields=('owner', 'title'), name='unique_subject_title_per_user'),
+        ),
+        migrations.AddConstraint(
+            model_name='classtype',
+            constraint=models.UniqueConstraint(fields=('owner', 'title'), name='unique_class_type_title_per_user'),
+        ),
+    ]
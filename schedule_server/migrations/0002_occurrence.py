@@ -0,0 +1,47 @@
+# Generated by Django 3.0.6 on 2026-10-17 02:24
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('schedule_server', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OccurrenceWindow',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date_from', models.DateField()),
+                ('date_to', models.DateField()),
+                ('owner', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='occurrence_window', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Occurrence',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('time_start', models.TimeField()),
+                ('time_end', models.TimeField()),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='occurrences', to=settings.AUTH_USER_MODEL)),
+                ('time', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='occurrences', to='schedule_server.Time')),
+            ],
+            options={
+                'ordering': ['date', 'time_start'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='occurrence',
+            index=models.Index(fields=['owner', 'date', 'time_start'], name='occurrence_owner_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='occurrence',
+            constraint=models.UniqueConstraint(fields=('time', 'date'), name='unique_occurrence_per_time_and_date'),
+        ),
+    ]
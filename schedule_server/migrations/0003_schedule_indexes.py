@@ -0,0 +1,33 @@
+# Generated by Django 3.0.6 on 2026-10-17 02:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedule_server', '0002_occurrence'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='subject',
+            index=models.Index(fields=['owner', 'created'], name='subject_owner_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['owner', '-due_date'], name='task_owner_due_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='teacher',
+            index=models.Index(fields=['owner', 'created'], name='teacher_owner_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='time',
+            index=models.Index(fields=['owner', 'date_start', 'date_end'], name='time_owner_dates_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='time',
+            index=models.Index(fields=['owner', 'time_start'], name='time_owner_time_start_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 3.0.6 on 2026-10-17 02:26
+
+from django.db import migrations, models
+
+
+def days_of_week_to_weekdays(apps, schema_editor):
+    Time = apps.get_model('schedule_server', 'Time')
+    for time in Time.objects.exclude(days_of_week__isnull=True).only('days_of_week'):
+        time.weekdays = sum(1 << (weekday - 1) for weekday in range(1, 8) if str(weekday) in time.days_of_week)
+        time.save(update_fields=['weekdays'])
+
+
+def weekdays_to_days_of_week(apps, schema_editor):
+    Time = apps.get_model('schedule_server', 'Time')
+    for time in Time.objects.exclude(weekdays__isnull=True).only('weekdays'):
+        time.days_of_week = ','.join(str(weekday) for weekday in range(1, 8) if time.weekdays >> (weekday - 1) & 1)
+        time.save(update_fields=['days_of_week'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedule_server', '0003_schedule_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='time',
+            name='weekdays',
+            field=models.PositiveSmallIntegerField(null=True),
+        ),
+        migrations.RunPython(days_of_week_to_weekdays, weekdays_to_days_of_week),
+        migrations.RemoveField(
+            model_name='time',
+            name='days_of_week',
+        ),
+    ]
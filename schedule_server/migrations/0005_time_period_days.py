@@ -0,0 +1,44 @@
+# Generated by Django 3.0.6 on 2026-10-17 02:27
+import re
+
+from django.db import migrations, models
+
+ISO_PERIOD = re.compile(r'^P(?:(\d+)W)?(?:(\d+)D)?$')
+
+
+def parse_period(value):
+    """Days in a period stored as a number or an ISO 8601 period like 'P2W', None if it is not usable."""
+    value = value.strip().upper()
+    if value.isdigit():
+        days = int(value)
+    else:
+        match = ISO_PERIOD.match(value)
+        if match is None:
+            return None
+        weeks, days = match.groups()
+        days = int(weeks or 0) * 7 + int(days or 0)
+    return days if 0 < days <= 32767 else None
+
+
+def normalize_periods(apps, schema_editor):
+    Time = apps.get_model('schedule_server', 'Time')
+    for time in Time.objects.exclude(period__isnull=True).only('period'):
+        period = parse_period(time.period)
+        time.period = None if period is None else str(period)
+        time.save(update_fields=['period'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedule_server', '0004_time_weekdays'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_periods, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='time',
+            name='period',
+            field=models.PositiveSmallIntegerField(null=True),
+        ),
+    ]
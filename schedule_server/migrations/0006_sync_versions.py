@@ -0,0 +1,139 @@
+# Generated by Django 3.0.6 on 2026-10-17 02:31
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+import django.db.models.deletion
+
+SYNCED_MODELS = ['Subject', 'Teacher', 'ClassType', 'Class', 'Time', 'Task']
+
+
+def number_versions(apps, schema_editor):
+    """Gives every existing object a distinct version, offsetting its id by the ids of the models before it."""
+    offset = 0
+    for name in SYNCED_MODELS:
+        model = apps.get_model('schedule_server', name)
+        model.objects.update(updated=F('created'), version=F('id') + offset)
+        offset += model.objects.aggregate(models.Max('id'))['id__max'] or 0
+    apps.get_model('schedule_server', 'ChangeSequence').objects.create(pk=1, value=offset)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('schedule_server', '0005_time_period_days'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeSequence',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resource', models.CharField(max_length=100)),
+                ('object_id', models.IntegerField()),
+                ('version', models.BigIntegerField()),
+            ],
+        ),
+        migrations.AddField(
+            model_name='class',
+            name='updated',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='class',
+            name='version',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='classtype',
+            name='updated',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='classtype',
+            name='version',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='subject',
+            name='updated',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='subject',
+            name='version',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='updated',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='version',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='teacher',
+            name='updated',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='teacher',
+            name='version',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='time',
+            name='updated',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='time',
+            name='version',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='class',
+            index=models.Index(fields=['owner', 'version'], name='class_owner_version_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='classtype',
+            index=models.Index(fields=['owner', 'version'], name='class_type_owner_version_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='subject',
+            index=models.Index(fields=['owner', 'version'], name='subject_owner_version_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['owner', 'version'], name='task_owner_version_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='teacher',
+            index=models.Index(fields=['owner', 'version'], name='teacher_owner_version_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='time',
+            index=models.Index(fields=['owner', 'version'], name='time_owner_version_idx'),
+        ),
+        migrations.AddField(
+            model_name='tombstone',
+            name='owner',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['owner', 'version'], name='tombstone_owner_version_idx'),
+        ),
+        migrations.RunPython(number_versions, migrations.RunPython.noop),
+    ]
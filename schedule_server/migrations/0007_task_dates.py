@@ -0,0 +1,66 @@
+# Generated by Django 3.0.6 on 2026-10-17 02:56
+
+import datetime
+
+from django.db import migrations, models
+from django.utils.dateparse import parse_date, parse_datetime
+
+
+def parse(value):
+    """A date or datetime stored as an ISO 8601 string, None if it is not usable."""
+    value = value.strip()
+    try:
+        return parse_datetime(value) or parse_date(value)
+    except ValueError:
+        return None
+
+
+def format_date(value):
+    value = parse(value)
+    return None if value is None else value.isoformat()[:10]
+
+
+def format_datetime(value):
+    """The datetime in UTC without an offset as it is stored, dates being midnight and naive times UTC."""
+    value = parse(value)
+    if value is None:
+        return None
+    if not isinstance(value, datetime.datetime):
+        value = datetime.datetime.combine(value, datetime.time())
+    if value.tzinfo is not None:
+        value = value.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return value.isoformat(' ')
+
+
+def normalize_dates(apps, schema_editor):
+    Task = apps.get_model('schedule_server', 'Task')
+    tasks = Task.objects.exclude(due_date__isnull=True, completed_at__isnull=True).only('due_date', 'completed_at')
+    for task in tasks:
+        task.due_date = None if task.due_date is None else format_date(task.due_date)
+        task.completed_at = None if task.completed_at is None else format_datetime(task.completed_at)
+        task.save(update_fields=['due_date', 'completed_at'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedule_server', '0006_sync_versions'),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_dates, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='task',
+            name='completed_at',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='task',
+            name='due_date',
+            field=models.DateField(null=True),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['owner', 'is_completed', 'due_date'], name='task_owner_agenda_idx'),
+        ),
+    ]
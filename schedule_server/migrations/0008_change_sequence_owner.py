@@ -0,0 +1,46 @@
+# Generated by Django 3.0.6 on 2026-10-17 04:12
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def split_sequence(apps, schema_editor):
+    """Starts the sequence of every user at the global value, so the cursors clients hold stay valid."""
+    ChangeSequence = apps.get_model('schedule_server', 'ChangeSequence')
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    value = ChangeSequence.objects.filter(owner__isnull=True).aggregate(models.Max('value'))['value__max'] or 0
+    ChangeSequence.objects.filter(owner__isnull=True).delete()
+    ChangeSequence.objects.bulk_create(
+        ChangeSequence(owner_id=user_id, value=value) for user_id in User.objects.values_list('pk', flat=True)
+    )
+
+
+def merge_sequences(apps, schema_editor):
+    """Continues the global sequence from the greatest value of any user."""
+    ChangeSequence = apps.get_model('schedule_server', 'ChangeSequence')
+    value = ChangeSequence.objects.aggregate(models.Max('value'))['value__max'] or 0
+    ChangeSequence.objects.all().delete()
+    ChangeSequence.objects.create(pk=1, value=value)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('schedule_server', '0007_task_dates'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='changesequence',
+            name='owner',
+            field=models.OneToOneField(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(split_sequence, merge_sequences),
+        migrations.AlterField(
+            model_name='changesequence',
+            name='owner',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
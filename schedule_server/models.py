@@ -1,8 +1,82 @@
-from django.db import models
-from django.db.models import UniqueConstraint
+from django.db import models, transaction
+from django.db.models import Case, F, Index, UniqueConstraint, Value, When
+from django.db.models.signals import post_delete, pre_delete
+from django.utils import timezone
 
+from schedule_server.occurances import get_days_of_week, get_weekdays_mask
 
-class Subject(models.Model):
+
+# Classes stamped by one statement of `touch_classes`, which binds three parameters for each of them
+TOUCH_BATCH_SIZE = 300
+
+
+class ChangeSequence(models.Model):
+    """The row counting changes of the synced objects of a user, see `next_versions`."""
+    owner = models.OneToOneField('auth.User', related_name='+', on_delete=models.CASCADE)
+    value = models.BigIntegerField(default=0)
+
+
+def next_versions(owner_id, count=1, create=True):
+    """
+    Reserves `count` consecutive change versions of a user and returns the first one.
+    Call it inside the transaction that writes them: the user's sequence row stays locked
+    until that transaction ends, so their versions are committed in increasing order
+    while writes of other users go on. Without `create`, returns None if the user has no
+    sequence, as while the user is deleted.
+    """
+    with transaction.atomic():
+        sequence = ChangeSequence.objects.filter(owner_id=owner_id)
+        if not sequence.update(value=F('value') + count):
+            if not create:
+                return None
+            ChangeSequence.objects.get_or_create(owner_id=owner_id)
+            sequence.update(value=F('value') + count)
+        return sequence.values_list('value', flat=True).get() - count + 1
+
+
+def stamp_versions(objects):
+    """Stamps objects written in bulk, which skips `save`, with consecutive new versions of each owner."""
+    by_owner = {}
+    for instance in objects:
+        by_owner.setdefault(instance.owner_id, []).append(instance)
+    updated = timezone.now()
+    for owner_id, instances in by_owner.items():
+        version = next_versions(owner_id, len(instances))
+        for offset, instance in enumerate(instances):
+            instance.version = version + offset
+            instance.updated = updated
+
+
+class Versioned(models.Model):
+    """Objects stamped with a new change version on every save, for delta sync."""
+    updated = models.DateTimeField(auto_now=True)
+    version = models.BigIntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            self.version = next_versions(self.owner_id)
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'updated', 'version'}
+            super().save(*args, **kwargs)
+
+
+class Tombstone(models.Model):
+    """Deleted synced object. Kept for users deleted afterwards, as they are not collected with them."""
+    owner = models.ForeignKey('auth.User', related_name='+', on_delete=models.DO_NOTHING, db_constraint=False)
+    resource = models.CharField(max_length=100)
+    object_id = models.IntegerField()
+    version = models.BigIntegerField()
+
+    class Meta:
+        indexes = [
+            Index(fields=['owner', 'version'], name='tombstone_owner_version_idx')
+        ]
+
+
+class Subject(Versioned):
     created = models.DateTimeField(auto_now_add=True)
     owner = models.ForeignKey('auth.User', related_name='subjects', on_delete=models.CASCADE)
     title = models.CharField(max_length=100)
@@ -10,12 +84,16 @@ class Subject(models.Model):
 
     class Meta:
         ordering = ['created']
+        indexes = [
+            Index(fields=['owner', 'created'], name='subject_owner_created_idx'),
+            Index(fields=['owner', 'version'], name='subject_owner_version_idx')
+        ]
         constraints = [
             UniqueConstraint(fields=['owner', 'title'], name='unique_subject_title_per_user')
         ]
 
 
-class Teacher(models.Model):
+class Teacher(Versioned):
     created = models.DateTimeField(auto_now_add=True)
     owner = models.ForeignKey('auth.User', related_name='teachers', on_delete=models.CASCADE)
     name = models.CharField(max_length=100)
@@ -24,24 +102,31 @@ class Teacher(models.Model):
 
     class Meta:
         ordering = ['created']
+        indexes = [
+            Index(fields=['owner', 'created'], name='teacher_owner_created_idx'),
+            Index(fields=['owner', 'version'], name='teacher_owner_version_idx')
+        ]
         constraints = [
             UniqueConstraint(fields=['owner', 'name'], name='unique_teacher_name_per_user')
         ]
 
 
-class ClassType(models.Model):
+class ClassType(Versioned):
     created = models.DateTimeField(auto_now_add=True)
     owner = models.ForeignKey('auth.User', related_name='class_types', on_delete=models.CASCADE)
     title = models.CharField(max_length=100)
     is_custom = models.BooleanField(default=True)
 
     class Meta:
+        indexes = [
+            Index(fields=['owner', 'version'], name='class_type_owner_version_idx')
+        ]
         constraints = [
             UniqueConstraint(fields=['owner', 'title'], name='unique_class_type_title_per_user')
         ]
 
 
-class Class(models.Model):
+class Class(Versioned):
     created = models.DateTimeField(auto_now_add=True)
     owner = models.ForeignKey('auth.User', related_name='classes', on_delete=models.CASCADE)
     subject = models.ForeignKey(Subject, on_delete=models.CASCADE)
@@ -49,13 +134,18 @@ class Class(models.Model):
     teacher = models.ForeignKey(Teacher, on_delete=models.SET_NULL, null=True)
     location = models.CharField(max_length=1000, default='')
 
+    class Meta:
+        indexes = [
+            Index(fields=['owner', 'version'], name='class_owner_version_idx')
+        ]
+
 
-class Time(models.Model):
+class Time(Versioned):
     created = models.DateTimeField(auto_now_add=True)
     owner = models.ForeignKey('auth.User', related_name='times', on_delete=models.CASCADE)
     class_ = models.ForeignKey(Class, name='class', on_delete=models.CASCADE)
-    period = models.CharField(max_length=100, null=True)
-    days_of_week = models.CharField(max_length=100, null=True)
+    period = models.PositiveSmallIntegerField(null=True)  # days, null is a single occurrence
+    weekdays = models.PositiveSmallIntegerField(null=True)  # bit 0 is Monday, null is every day
     date_start = models.DateField(null=True)
     date_end = models.DateField(null=True)
     time_start = models.TimeField()
@@ -63,9 +153,45 @@ class Time(models.Model):
 
     class Meta:
         ordering = ['time_start']
+        indexes = [
+            Index(fields=['owner', 'date_start', 'date_end'], name='time_owner_dates_idx'),
+            Index(fields=['owner', 'time_start'], name='time_owner_time_start_idx'),
+            Index(fields=['owner', 'version'], name='time_owner_version_idx')
+        ]
 
+    @property
+    def days_of_week(self):
+        return get_days_of_week(self.weekdays)
 
-class Task(models.Model):
+    @days_of_week.setter
+    def days_of_week(self, value):
+        self.weekdays = get_weekdays_mask(value)
+
+
+class Occurrence(models.Model):
+    owner = models.ForeignKey('auth.User', related_name='occurrences', on_delete=models.CASCADE)
+    date = models.DateField()
+    time = models.ForeignKey(Time, related_name='occurrences', on_delete=models.CASCADE)
+    time_start = models.TimeField()
+    time_end = models.TimeField()
+
+    class Meta:
+        ordering = ['date', 'time_start']
+        indexes = [
+            Index(fields=['owner', 'date', 'time_start'], name='occurrence_owner_date_idx')
+        ]
+        constraints = [
+            UniqueConstraint(fields=['time', 'date'], name='unique_occurrence_per_time_and_date')
+        ]
+
+
+class OccurrenceWindow(models.Model):
+    owner = models.OneToOneField('auth.User', related_name='occurrence_window', on_delete=models.CASCADE)
+    date_from = models.DateField()
+    date_to = models.DateField()
+
+
+class Task(Versioned):
     created = models.DateTimeField(auto_now_add=True)
     owner = models.ForeignKey('auth.User', related_name='tasks', on_delete=models.CASCADE)
     title = models.CharField(max_length=100)
@@ -73,8 +199,61 @@ class Task(models.Model):
     priority = models.IntegerField(choices=[(0, 'none'), (1, 'low'), (2, 'medium'), (3, 'high')], default=0)
     is_completed = models.BooleanField(default=False)
     class_ = models.ForeignKey(Class, name='class', on_delete=models.CASCADE, null=True)
-    due_date = models.CharField(max_length=100, null=True)
-    completed_at = models.CharField(max_length=100, null=True)
+    due_date = models.DateField(null=True)
+    completed_at = models.DateTimeField(null=True)
 
     class Meta:
         ordering = ['-due_date']
+        indexes = [
+            Index(fields=['owner', '-due_date'], name='task_owner_due_date_idx'),
+            Index(fields=['owner', 'is_completed', 'due_date'], name='task_owner_agenda_idx'),
+            Index(fields=['owner', 'version'], name='task_owner_version_idx')
+        ]
+
+
+SYNCED_MODELS = [Subject, Teacher, ClassType, Class, Time, Task]
+
+
+def get_resource(model):
+    """Name of a synced model in the API, the related name of its owner like 'class_types'."""
+    return model._meta.get_field('owner').remote_field.related_name
+
+
+def delete_sequence(sender, instance, **kwargs):
+    """
+    Objects of a deleted user are deleted with them, so drop their sequence first, which makes
+    the handlers below skip their tombstones and stamps.
+    """
+    ChangeSequence.objects.filter(owner_id=instance.pk).delete()
+
+
+def create_tombstone(sender, instance, **kwargs):
+    version = next_versions(instance.owner_id, create=False)
+    if version is None:
+        return
+    Tombstone.objects.create(owner_id=instance.owner_id, resource=get_resource(sender), object_id=instance.pk,
+                             version=version)
+
+
+def touch_classes(sender, instance, **kwargs):
+    """Classes lose their deleted type or teacher in an update that does not save them, so stamp them here."""
+    field = 'type' if sender is ClassType else 'teacher'
+    class_ids = list(Class.objects.filter(**{field: instance}).values_list('id', flat=True))
+    if not class_ids:
+        return
+    version = next_versions(instance.owner_id, len(class_ids), create=False)
+    if version is None:
+        return
+    updated = timezone.now()
+    for start in range(0, len(class_ids), TOUCH_BATCH_SIZE):
+        batch = class_ids[start:start + TOUCH_BATCH_SIZE]
+        Class.objects.filter(id__in=batch).update(updated=updated, version=Case(
+            *(When(id=class_id, then=Value(version + start + offset)) for offset, class_id in enumerate(batch))
+        ))
+
+
+pre_delete.connect(delete_sequence, sender='auth.User')
+for model in SYNCED_MODELS:
+    post_delete.connect(create_tombstone, sender=model)
+pre_delete.connect(touch_classes, sender=ClassType)
+pre_delete.connect(touch_classes, sender=Teacher)
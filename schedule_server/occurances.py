@@ -41,30 +41,180 @@
 # }
 import datetime
 from datetime import timedelta
+from math import gcd
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+DAYS_IN_WEEK = 7
+ALL_WEEKDAYS = (1 << DAYS_IN_WEEK) - 1
+MAX_ORDINAL = datetime.date.max.toordinal()
 
-def get_closest_future_occurrence(date: datetime.date, start: datetime.date, recurrence: timedelta):
-    occurrence = start
-    if recurrence.days / 7 >= 1:
-        date_dow = date.weekday()
-        start_dow = start.weekday()
-        if start_dow < date_dow:
-            occurrence += timedelta(date_dow - start_dow)
-        elif start_dow > date_dow:
-            occurrence -= timedelta(start_dow - date_dow)
-
-    distance = abs((occurrence - date).days)
-    if distance > 0:
-        factor = int(distance / recurrence.days)
-        if factor > 0:
-            quick_advance = recurrence * factor
-            occurrence += quick_advance
 
-    while occurrence < date:
-        occurrence += recurrence
+def get_anchor(date: datetime.date, start: datetime.date, period: int):
+    """
+    Start of the recurrence as seen from `date`. Periods of a week or longer are
+    shifted to the weekday of `date` within the week of `start`, like the client does.
+    """
+    if period >= DAYS_IN_WEEK:
+        return start + timedelta(date.weekday() - start.weekday())
+    return start
 
+
+def get_closest_future_occurrence(date: datetime.date, start: datetime.date, recurrence: timedelta):
+    period = recurrence.days
+    occurrence = get_anchor(date, start, period)
+    distance = date.toordinal() - occurrence.toordinal()
+    if distance > 0:
+        occurrence += timedelta(-(-distance // period) * period)
     return occurrence
 
 
 def is_occurrence(date: datetime.date, start: datetime.date, recurrence: timedelta):
-    return date == (start if not recurrence else get_closest_future_occurrence(date, start, recurrence))
+    if not recurrence:
+        return date == start
+    distance = date.toordinal() - get_anchor(date, start, recurrence.days).toordinal()
+    return distance >= 0 and distance % recurrence.days == 0
+
+
+def get_occurrences(start: datetime.date, recurrence: timedelta, date_from: datetime.date, date_to: datetime.date,
+                    weekdays=None):
+    """
+    All dates from `date_from` to `date_to` inclusive for which `is_occurrence` holds, in ascending order.
+    `weekdays` optionally restricts the result to the given ISO weekdays (1 is Monday).
+    """
+    if not recurrence:
+        if date_from <= start <= date_to and (weekdays is None or start.isoweekday() in weekdays):
+            return [start]
+        return []
+
+    period = recurrence.days
+    if period < DAYS_IN_WEEK:
+        anchors = [start]
+        step = period
+    else:
+        # Every weekday recurs from its own anchor, and keeps its weekday only every lcm(period, 7) days.
+        anchors = [start + timedelta(weekday - start.weekday()) for weekday in range(DAYS_IN_WEEK)
+                   if weekdays is None or weekday + 1 in weekdays]
+        step = period * DAYS_IN_WEEK // gcd(period, DAYS_IN_WEEK)
+
+    first_ordinal, last_ordinal = date_from.toordinal(), date_to.toordinal()
+    ordinals = []
+    for anchor in anchors:
+        ordinal = anchor.toordinal()
+        if ordinal < first_ordinal:
+            ordinal += -(-(first_ordinal - ordinal) // step) * step
+        ordinals.extend(range(ordinal, last_ordinal + 1, step))
+    if len(anchors) > 1:
+        ordinals.sort()
+
+    occurrences = [date_from + timedelta(ordinal - first_ordinal) for ordinal in ordinals]
+    if weekdays is not None and period < DAYS_IN_WEEK:
+        occurrences = [date for date in occurrences if date.isoweekday() in weekdays]
+    return occurrences
+
+
+def get_weekdays_mask(days_of_week):
+    """Bitmask of the ISO weekdays mentioned in a days of week string like '1,2', bit 0 being Monday."""
+    if days_of_week is None:
+        return None
+    return sum(1 << (weekday - 1) for weekday in range(1, DAYS_IN_WEEK + 1) if str(weekday) in days_of_week)
+
+
+def get_days_of_week(weekdays_mask):
+    if weekdays_mask is None:
+        return None
+    return ','.join(str(weekday) for weekday in get_weekdays(weekdays_mask))
+
+
+def get_weekdays(weekdays_mask):
+    """ISO weekdays set in a weekdays bitmask, `None` meaning every day."""
+    if weekdays_mask is None:
+        return None
+    return [weekday for weekday in range(1, DAYS_IN_WEEK + 1) if weekdays_mask >> (weekday - 1) & 1]
+
+
+def get_time_occurrences(time, date_from: datetime.date, date_to: datetime.date):
+    """Dates from `date_from` to `date_to` inclusive on which a `Time` takes place."""
+    if time.date_start is None:
+        return []
+    return get_occurrences(time.date_start, timedelta(time.period) if time.period else None,
+                           max(date_from, time.date_start), min(date_to, time.date_end or date_to),
+                           get_weekdays(time.weekdays))
+
+
+def add_days(date: datetime.date, days):
+    """`date` moved forward by `days`, stopping at the last date there is."""
+    return datetime.date.fromordinal(min(date.toordinal() + days, MAX_ORDINAL))
+
+
+def get_first_occurrence(time):
+    """The first date on which a `Time` takes place, or None if it never does."""
+    if time.date_start is None:
+        return None
+    # every recurrence visits each of its weekdays within 7 periods of its start
+    occurrences = get_time_occurrences(time, time.date_start,
+                                       add_days(time.date_start, DAYS_IN_WEEK * (time.period or 1)))
+    return occurrences[0] if occurrences else None
+
+
+def _weekday(ordinal):
+    return (ordinal - 1) % DAYS_IN_WEEK
+
+
+def _is_occurrence_ordinal(ordinal, start, period, end, weekdays_mask):
+    if ordinal < start or ordinal > end or not weekdays_mask >> _weekday(ordinal) & 1:
+        return False
+    if not period:
+        return ordinal == start
+    if period >= DAYS_IN_WEEK:
+        start += _weekday(ordinal) - _weekday(start)
+    return (ordinal - start) % period == 0
+
+
+def _numpy_occurrences(starts, periods, ends, weekdays_masks, ordinals):
+    starts = numpy.asarray(starts, dtype=numpy.int64)[:, None]
+    periods = numpy.asarray(periods, dtype=numpy.int64)[:, None]
+    ends = numpy.asarray(ends, dtype=numpy.int64)[:, None]
+    weekdays_masks = numpy.asarray(weekdays_masks, dtype=numpy.int64)[:, None]
+    ordinals = numpy.asarray(ordinals, dtype=numpy.int64)[None, :]
+
+    anchors = numpy.where(periods >= DAYS_IN_WEEK, starts + (ordinals - 1) % DAYS_IN_WEEK - (starts - 1) % DAYS_IN_WEEK,
+                          starts)
+    distances = ordinals - anchors
+    recurring = (distances >= 0) & (distances % numpy.maximum(periods, 1) == 0)
+    on_weekday = (weekdays_masks >> (ordinals - 1) % DAYS_IN_WEEK) & 1 == 1
+    return ((ordinals >= starts) & (ordinals <= ends) & on_weekday
+            & numpy.where(periods > 0, recurring, ordinals == starts))
+
+
+def occurrence_matrix(starts, periods, ends, date_from: datetime.date, date_to: datetime.date, weekdays_masks=None):
+    """
+    Occurrences of many recurrences over every date from `date_from` to `date_to` inclusive.
+
+    `starts` and `ends` are parallel sequences of date ordinals (`None` for an open end) and `periods` holds
+    the recurrence period in days (`0` or `None` for a single occurrence). `weekdays_masks` optionally
+    restricts each recurrence to a bitmask of weekdays (`None` for every day). Returns one row of booleans per
+    recurrence and one column per date, as a NumPy array when NumPy is installed and as nested lists otherwise.
+    """
+    ordinals = range(date_from.toordinal(), date_to.toordinal() + 1)
+    periods = [period or 0 for period in periods]
+    ends = [MAX_ORDINAL if end is None else end for end in ends]
+    if weekdays_masks is None:
+        weekdays_masks = [ALL_WEEKDAYS] * len(periods)
+    else:
+        weekdays_masks = [ALL_WEEKDAYS if mask is None else mask for mask in weekdays_masks]
+    if numpy is not None:
+        return _numpy_occurrences(starts, periods, ends, weekdays_masks, ordinals)
+    return [[_is_occurrence_ordinal(ordinal, start, period, end, weekdays_mask) for ordinal in ordinals]
+            for start, period, end, weekdays_mask in zip(starts, periods, ends, weekdays_masks)]
+
+
+def occurrence_mask(starts, periods, ends, date: datetime.date, weekdays_masks=None):
+    """Which of the recurrences described as in `occurrence_matrix` occur on `date`."""
+    matrix = occurrence_matrix(starts, periods, ends, date, date, weekdays_masks)
+    if numpy is not None:
+        return matrix[:, 0]
+    return [row[0] for row in matrix]
@@ -0,0 +1,118 @@
+"""
+Keyset pagination of list endpoints in the order of their model's `Meta.ordering`.
+
+Pages start after the ordering values of the previous page's last object, which the `next` link
+carries as an opaque cursor, so every page costs one indexed range query however deep it is.
+The primary key breaks ties between objects with equal ordering values.
+"""
+import base64
+import binascii
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.db.models import Q
+from rest_framework import pagination
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(pagination.BasePagination):
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset)
+        cursor = self.decode_cursor(request.query_params.get(self.cursor_query_param))
+        if cursor is not None:
+            queryset = queryset.filter(self.get_after(queryset, cursor))
+        queryset = queryset.order_by(*[('-' if descending else '') + field.name
+                                       for field, descending in self.ordering])
+
+        page = list(queryset[:page_size + 1])
+        self.next_cursor = None
+        if len(page) > page_size:
+            page = page[:page_size]
+            self.next_cursor = [getattr(page[-1], field.attname) for field, _ in self.ordering]
+        return page
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def get_ordering(self, queryset):
+        """(field, descending) pairs of the queryset's ordering with the primary key last."""
+        opts = queryset.model._meta
+        ordering = []
+        for name in list(queryset.query.order_by or opts.ordering) + ['pk']:
+            descending = name.startswith('-')
+            field = opts.pk if name.lstrip('-') == 'pk' else opts.get_field(name.lstrip('-'))
+            if field not in [field for field, _ in ordering]:
+                ordering.append((field, descending))
+        return ordering
+
+    def get_after(self, queryset, cursor):
+        """Objects after the ordering values of `cursor`, where nulls sort as the database sorts them."""
+        nulls_largest = connections[queryset.db].features.nulls_order_largest
+        after = Q(pk__in=[])
+        equal = Q()
+        for (field, descending), value in zip(self.ordering, cursor):
+            nulls_last = nulls_largest != descending
+            if value is None:
+                if not nulls_last:
+                    after |= equal & Q(**{f'{field.name}__isnull': False})
+                equal &= Q(**{f'{field.name}__isnull': True})
+                continue
+            greater = Q(**{f'{field.name}__{"lt" if descending else "gt"}': value})
+            if field.null and nulls_last:
+                greater |= Q(**{f'{field.name}__isnull': True})
+            after |= equal & greater
+            equal &= Q(**{field.name: value})
+        return after
+
+    def decode_cursor(self, encoded):
+        if encoded is None:
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            if not isinstance(cursor, list) or len(cursor) != len(self.ordering):
+                raise ValueError
+            return [None if value is None else field.to_python(value)
+                    for (field, _), value in zip(self.ordering, cursor)]
+        except (TypeError, ValueError, UnicodeEncodeError, binascii.Error, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, values):
+        return base64.urlsafe_b64encode(json.dumps(values, default=str).encode()).decode('ascii')
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_cursor))
@@ -10,4 +10,4 @@ class IsOwnerOrAdmin(permissions.BasePermission):
         return bool(request.user) and request.user.is_authenticated
 
     def has_object_permission(self, request, view, obj):
-        return bool(request.user) and (request.user.is_staff or obj.owner == request.user)
+        return bool(request.user) and (request.user.is_staff or obj.owner_id == request.user.id)
@@ -1,7 +1,10 @@
+from operator import attrgetter
+
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError as DjangoValidationError
 from rest_framework import serializers
 
-from schedule_server import models
+from schedule_server import bulk, models
 from schedule_server.models import Subject, ClassType, Teacher, Class
 
 
@@ -15,6 +18,22 @@ class UserSerializer(serializers.HyperlinkedModelSerializer):
 
     password = serializers.CharField(write_only=True)
 
+    # What the `collections` in the context makes of the owned objects
+    IDS = 'ids'
+    COUNTS = 'counts'
+    NONE = 'none'
+    COLLECTIONS = ['subjects', 'teachers', 'class_types', 'classes', 'times', 'tasks']
+
+    def get_fields(self):
+        fields = super().get_fields()
+        collections = self.context.get('collections', self.IDS)
+        if collections != self.IDS:
+            for name in self.COLLECTIONS:
+                del fields[name]
+                if collections == self.COUNTS:
+                    fields[f'{name}_count'] = serializers.IntegerField(read_only=True)
+        return fields
+
     def create(self, validated_data):
         user = User.objects.create(username=validated_data['username'])
         user.set_password(validated_data['password'])
@@ -35,65 +54,228 @@ class UserSerializer(serializers.HyperlinkedModelSerializer):
 #         fields = ['url', 'name']
 
 
+class OwnerField(serializers.ReadOnlyField):
+    """
+    Username of the owner of an object. Objects of the requesting user are named without loading
+    their owner, and other owners not loaded with their objects are loaded once per serializer.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(source='owner.username', **kwargs)
+
+    def get_attribute(self, instance):
+        request = self.context.get('request')
+        if request is not None and instance.owner_id == request.user.id:
+            return request.user.username
+        if instance._meta.get_field('owner').is_cached(instance):
+            return instance.owner.username
+        usernames = self.context.setdefault('usernames', {})
+        if instance.owner_id not in usernames:
+            usernames[instance.owner_id] = instance.owner.username
+        return usernames[instance.owner_id]
+
+
+class PrefetchedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Takes related objects from those `BulkListSerializer` fetched for a whole list, if it did."""
+
+    def to_internal_value(self, data):
+        prefetched = self.context.get('prefetched', {}).get(self)
+        if prefetched is None:
+            return super().to_internal_value(data)
+        try:
+            return prefetched[self.queryset.model._meta.pk.to_python(data)]
+        except KeyError:
+            self.fail('does_not_exist', pk_value=data)
+        except (TypeError, ValueError, DjangoValidationError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+
+class BulkListSerializer(serializers.ListSerializer):
+    """
+    Lists of owned objects validated and written together. Objects referenced by key are fetched
+    with one query per field, and the list is inserted or updated in bulk.
+    """
+
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            self.prefetch(data)
+        return super().to_internal_value(data)
+
+    def prefetch(self, data):
+        prefetched = self.context.setdefault('prefetched', {})
+        for name, field in self.child.fields.items():
+            if not isinstance(field, PrefetchedPrimaryKeyRelatedField) or field.read_only:
+                continue
+            pks = set()
+            for item in data:
+                try:
+                    pks.add(field.queryset.model._meta.pk.to_python(item[name]))
+                except (KeyError, TypeError, ValueError, DjangoValidationError):
+                    pass
+            prefetched[field] = field.get_queryset().in_bulk(pks - {None})
+
+    def resolve(self, validated_data):
+        """Replaces nested data in the validated data of each object by instances."""
+        return validated_data
+
+    def create(self, validated_data):
+        model = self.child.Meta.model
+        return bulk.create_all(model, [model(**attrs) for attrs in self.resolve(validated_data)])
+
+    def update(self, instances, validated_data):
+        validated_data = self.resolve([{'owner': instance.owner, **attrs}
+                                       for instance, attrs in zip(instances, validated_data)])
+        for instance, attrs in zip(instances, validated_data):
+            for attr, value in attrs.items():
+                setattr(instance, attr, value)
+        return bulk.update_all(self.child.Meta.model, instances)
+
+
+class ClassListSerializer(BulkListSerializer):
+
+    def to_internal_value(self, data):
+        validated_data = super().to_internal_value(data)
+        self.check_nested(validated_data)
+        return validated_data
+
+    def check_nested(self, validated_data):
+        """
+        Rejects items giving a nested object other values than an earlier item with the same owner and key did,
+        which would resolve to one object and silently keep the values of the last of them.
+        """
+        if self.instance is not None:
+            owner_ids = [instance.owner_id for instance in self.instance]
+        else:
+            owner_ids = [self.context['request'].user.id] * len(validated_data)
+        errors, given = [{} for _ in validated_data], {}
+        for index, (owner_id, attrs) in enumerate(zip(owner_ids, validated_data)):
+            for field, model in self.child.NESTED:
+                if field not in attrs:
+                    continue
+                key = bulk.Resolver.NATURAL_KEYS[model]
+                values = given.setdefault((model, owner_id, attrs[field][key]), {})
+                for name, value in attrs[field].items():
+                    first, first_value = values.setdefault(name, (index, value))
+                    if first_value != value:
+                        errors[index].setdefault(field, {})[name] = [
+                            f'Conflicts with item {first}, which has the same {key}.']
+        if any(errors):
+            raise serializers.ValidationError(errors)
+
+    def resolve(self, validated_data):
+        return self.child.resolve(validated_data)
+
+
 class SubjectSerializer(serializers.ModelSerializer):
-    owner = serializers.ReadOnlyField(source='owner.username')
+    owner = OwnerField()
 
     class Meta:
         model = models.Subject
+        list_serializer_class = BulkListSerializer
         fields = ['id', 'title', 'color', 'owner', 'created']
 
 
 class TeacherSerializer(serializers.ModelSerializer):
     phone = serializers.CharField(allow_blank=True)
     email = serializers.CharField(allow_blank=True)
-    owner = serializers.ReadOnlyField(source='owner.username')
+    owner = OwnerField()
 
     class Meta:
         model = models.Teacher
+        list_serializer_class = BulkListSerializer
         fields = ['id', 'name', 'phone', 'email', 'owner', 'created']
 
 
 class ClassTypeSerializer(serializers.ModelSerializer):
-    owner = serializers.ReadOnlyField(source='owner.username')
+    owner = OwnerField()
 
     class Meta:
         model = models.ClassType
+        list_serializer_class = BulkListSerializer
         fields = ['id', 'title', 'is_custom', 'owner', 'created']
 
 
 class ClassSerializer(serializers.ModelSerializer):
-    owner = serializers.ReadOnlyField(source='owner.username')
+    owner = OwnerField()
     subject = SubjectSerializer()
     type = ClassTypeSerializer()
     teacher = TeacherSerializer(required=False)
 
+    NESTED = (('subject', Subject), ('type', ClassType), ('teacher', Teacher))
+
     class Meta:
         model = models.Class
+        list_serializer_class = ClassListSerializer
         fields = ['id', 'subject', 'type', 'teacher', 'location', 'owner', 'created']
 
+    def validate(self, attrs):
+        for field, model in self.NESTED:
+            key = bulk.Resolver.NATURAL_KEYS[model]
+            if field in attrs and key not in attrs[field]:
+                raise serializers.ValidationError({field: {key: ['This field is required.']}})
+        return attrs
+
     def create(self, validated_data):
-        subject, _ = Subject.objects.get_or_create(owner=validated_data['owner'], **validated_data.pop('subject'))
-        class_type, _ = ClassType.objects.get_or_create(owner=validated_data['owner'], **validated_data.pop('type'))
-        if 'teacher' in validated_data:
-            teacher, _ = Teacher.objects.get_or_create(owner=validated_data['owner'], **validated_data.pop('teacher'))
-        else:
-            teacher = None
-        return Class.objects.create(subject=subject, type=class_type, teacher=teacher, **validated_data)
+        return Class.objects.create(**self.resolve([validated_data])[0])
+
+    def resolve(self, validated_data):
+        """Replaces nested data in the validated data of classes by objects of their owners."""
+        resolver = self.context.setdefault('resolver', bulk.Resolver())
+        for field, model in self.NESTED:
+            nested = [attrs for attrs in validated_data if field in attrs]
+            instances = resolver.resolve(model, [(attrs['owner'], attrs[field]) for attrs in nested])
+            for attrs, instance in zip(nested, instances):
+                attrs[field] = instance
+        return validated_data
 
 
 class TimeSerializer(serializers.ModelSerializer):
-    owner = serializers.ReadOnlyField(source='owner.username')
+    serializer_related_field = PrefetchedPrimaryKeyRelatedField
+    days_of_week = serializers.RegexField(r'^[1-7](\s*,?\s*[1-7])*$', max_length=100, allow_null=True, required=False,
+                                          error_messages={'invalid': 'Expected ISO weekdays 1-7 like "1,2,3".'})
+    owner = OwnerField()
 
     class Meta:
         model = models.Time
+        list_serializer_class = BulkListSerializer
         fields = ['id', 'class', 'period', 'days_of_week', 'date_start',
                   'date_end', 'time_start', 'time_end', 'owner', 'created']
+        extra_kwargs = {'period': {'min_value': 1}}
 
 
 class TaskSerializer(serializers.ModelSerializer):
-    owner = serializers.ReadOnlyField(source='owner.username')
+    serializer_related_field = PrefetchedPrimaryKeyRelatedField
+    owner = OwnerField()
 
     class Meta:
         model = models.Task
+        list_serializer_class = BulkListSerializer
         fields = ['id', 'title', 'description', 'priority', 'is_completed',
                   'class', 'due_date', 'completed_at', 'owner', 'created']
+
+
+def compile_representation(serializer, field_names=None):
+    """
+    A function giving objects the representation `serializer` gives them, or the part of it in `field_names`,
+    for read paths too hot for the serializer machinery. The fields are bound once, and each object then only
+    costs attribute lookups and the `to_representation` of its fields.
+    """
+    getters = []
+    for name, field in serializer.fields.items():
+        if field.write_only or (field_names is not None and name not in field_names):
+            continue
+        if isinstance(field, serializers.BaseSerializer):
+            convert = compile_representation(field)
+        elif isinstance(field, serializers.ReadOnlyField):
+            convert = None
+        else:
+            convert = field.to_representation
+        getters.append((name, attrgetter('.'.join(field.source_attrs)), convert))
+
+    def to_representation(instance):
+        representation = {}
+        for name, get, convert in getters:
+            value = get(instance)
+            representation[name] = value if value is None or convert is None else convert(value)
+        return representation
+    return to_representation
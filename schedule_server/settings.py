@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/3.0/ref/settings/
 
 import os
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -75,12 +77,43 @@ WSGI_APPLICATION = 'schedule_server.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.0/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+# DATABASE_ENGINE picks the profile, 'sqlite' by default or 'postgres'
+
+DATABASE_ENGINE = os.environ.get('DATABASE_ENGINE', 'sqlite')
+
+if DATABASE_ENGINE == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'schedule_server.backends.sqlite3',
+            'NAME': os.environ.get('DATABASE_NAME', os.path.join(BASE_DIR, 'db.sqlite3')),
+            'OPTIONS': {
+                # Seconds a write waits for the lock held by another connection
+                'timeout': float(os.environ.get('DATABASE_TIMEOUT', 20)),
+                # Writes take the lock when their transaction begins, so they queue for it instead of failing
+                'transaction_mode': 'IMMEDIATE',
+                # Readers don't block the writer nor the writer readers, and commits only sync at checkpoints
+                'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL; '
+                                'PRAGMA cache_size=-20000; PRAGMA temp_store=MEMORY',
+            },
+        }
     }
-}
+elif DATABASE_ENGINE == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DATABASE_NAME', 'schedule_server'),
+            'USER': os.environ.get('DATABASE_USER', ''),
+            'PASSWORD': os.environ.get('DATABASE_PASSWORD', ''),
+            'HOST': os.environ.get('DATABASE_HOST', ''),
+            'PORT': os.environ.get('DATABASE_PORT', ''),
+            # Seconds each server thread keeps its connection open for the next requests
+            'CONN_MAX_AGE': int(os.environ.get('DATABASE_CONN_MAX_AGE', 60)),
+            # A pooler in transaction mode, like PgBouncer, can't keep the cursors of exports open across queries
+            'DISABLE_SERVER_SIDE_CURSORS': os.environ.get('DATABASE_POOL_MODE') == 'transaction',
+        }
+    }
+else:
+    raise ImproperlyConfigured(f"DATABASE_ENGINE must be 'sqlite' or 'postgres', not {DATABASE_ENGINE!r}")
 
 # Password validation
 # https://docs.djangoproject.com/en/3.0/ref/settings/#auth-password-validators
@@ -117,3 +150,31 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/3.0/howto/static-files/
 
 STATIC_URL = '/static/'
+
+REST_FRAMEWORK = {
+    'DEFAULT_PAGINATION_CLASS': 'schedule_server.pagination.KeysetPagination',
+    'PAGE_SIZE': 100,
+}
+
+# Schedule
+
+# Occurrences of every user's times are materialized for this many days around today
+SCHEDULE_OCCURRENCES_DAYS_BEFORE = 31
+SCHEDULE_OCCURRENCES_DAYS_AFTER = 366
+
+# Cache of resource versions and schedule responses, swap its backend to share it between processes
+SCHEDULE_CACHE_ALIAS = 'schedule'
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    SCHEDULE_CACHE_ALIAS: {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'schedule',
+        'TIMEOUT': 60 * 60,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+}
@@ -0,0 +1,62 @@
+"""
+Delta sync of the objects users own, for clients that keep a local copy.
+
+Every save of a synced object stamps it with the next value of its owner's change sequence and every
+delete leaves a tombstone stamped the same way, so the changes of a user after a cursor are the
+objects and tombstones with greater versions. A page of changes ends at the version of its last
+change, which is the cursor of the next page.
+"""
+from operator import itemgetter
+
+from schedule_server import models, serializers
+
+DEFAULT_LIMIT = 500
+MAX_LIMIT = 1000
+
+SERIALIZERS = {
+    models.Subject: serializers.SubjectSerializer,
+    models.Teacher: serializers.TeacherSerializer,
+    models.ClassType: serializers.ClassTypeSerializer,
+    models.Class: serializers.ClassSerializer,
+    models.Time: serializers.TimeSerializer,
+    models.Task: serializers.TaskSerializer,
+}
+
+RELATED_FIELDS = {
+    models.Class: ['owner', 'subject__owner', 'type__owner', 'teacher__owner'],
+}
+
+
+def get_changes(user_id, since, limit):
+    """Up to `limit` (version, resource, object or tombstone) changes after `since`, and whether more follow."""
+    changes = []
+    for model in models.SYNCED_MODELS:
+        objects = model.objects.filter(
+            owner_id=user_id, version__gt=since
+        ).select_related(*RELATED_FIELDS.get(model, ['owner'])).order_by('version')[:limit + 1]
+        resource = models.get_resource(model)
+        changes.extend((instance.version, resource, instance) for instance in objects)
+    tombstones = models.Tombstone.objects.filter(owner_id=user_id, version__gt=since).order_by('version')[:limit + 1]
+    changes.extend((tombstone.version, tombstone.resource, tombstone) for tombstone in tombstones)
+    changes.sort(key=itemgetter(0))
+    return changes[:limit], len(changes) > limit
+
+
+def build_change(version, resource, instance):
+    if isinstance(instance, models.Tombstone):
+        return {'resource': resource, 'id': instance.object_id, 'version': version, 'deleted': True, 'data': None}
+    data = SERIALIZERS[type(instance)](instance).data
+    return {'resource': resource, 'id': instance.pk, 'version': version, 'deleted': False, 'data': data}
+
+
+def get_page(user_id, since=0, limit=DEFAULT_LIMIT):
+    """
+    Changes of a user after the cursor `since` in the order they were made. Objects changed
+    several times appear once, at their latest version.
+    """
+    changes, has_more = get_changes(user_id, since, limit)
+    return {
+        'changes': [build_change(*change) for change in changes],
+        'cursor': changes[-1][0] if changes else since,
+        'has_more': has_more,
+    }
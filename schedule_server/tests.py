@@ -1,17 +1,88 @@
-from datetime import datetime, timedelta
+import asyncio
+import json
+import os
+import random
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone
 from operator import itemgetter
+from unittest import mock, skipIf
 
 from django.contrib.auth.models import User
-from django.test import TestCase
+from django.core.exceptions import ImproperlyConfigured
+from django.db import OperationalError, connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework import status
-from rest_framework.test import APITestCase
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APITestCase
 
-from schedule_server import models, serializers, views
-from schedule_server.occurances import get_closest_future_occurrence, is_occurrence
+from schedule_server import bulk, caching, conflicts, export, materialization, models, occurances, serializers, views
+from schedule_server.asgi import ThreadPoolASGIHandler
+from schedule_server.backends.sqlite3.base import DatabaseWrapper
+from schedule_server.occurances import get_closest_future_occurrence, is_occurrence, get_occurrences
+
+
+def legacy_get_closest_future_occurrence(date, start, recurrence):
+    """The original loop-based implementation, kept as a reference for the closed-form one"""
+    occurrence = start
+    if recurrence.days / 7 >= 1:
+        date_dow = date.weekday()
+        start_dow = start.weekday()
+        if start_dow < date_dow:
+            occurrence += timedelta(date_dow - start_dow)
+        elif start_dow > date_dow:
+            occurrence -= timedelta(start_dow - date_dow)
+
+    distance = abs((occurrence - date).days)
+    if distance > 0:
+        factor = int(distance / recurrence.days)
+        if factor > 0:
+            quick_advance = recurrence * factor
+            occurrence += quick_advance
+
+    while occurrence < date:
+        occurrence += recurrence
+
+    return occurrence
+
+
+def legacy_is_occurrence(date, start, recurrence):
+    return date == (start if not recurrence else legacy_get_closest_future_occurrence(date, start, recurrence))
+
+
+@contextmanager
+def run_on_commit():
+    """Runs the on_commit callbacks registered inside, which the transaction of a TestCase never commits."""
+    start = len(connection.run_on_commit)
+    try:
+        yield
+    finally:
+        callbacks = connection.run_on_commit[start:]
+        del connection.run_on_commit[start:]
+        for _, callback in callbacks:
+            callback()
+
+
+class OnCommitAPIClient(APIClient):
+    """A client whose requests run the on_commit callbacks of their writes, as they would commit outside tests."""
+
+    def request(self, **kwargs):
+        with run_on_commit():
+            return super().request(**kwargs)
 
 
 class OccurrenceDetectionTests(TestCase):
+    EXAMPLES = 2000
+
+    @staticmethod
+    def random_case(rng):
+        start = date(2000, 1, 1) + timedelta(rng.randrange(365 * 40))
+        day = start + timedelta(rng.randrange(-60, 365 * 5))
+        recurrence = timedelta(rng.choice([rng.randrange(1, 30), 7 * rng.randrange(1, 5), rng.randrange(1, 400)]))
+        return day, start, recurrence
 
     def test_get_closest_future_occurrence(self):
         test_data = [
@@ -35,6 +106,78 @@ class OccurrenceDetectionTests(TestCase):
             occurrence = is_occurrence(today, start, recurrence)
             self.assertIs(occurrence, expected_result)
 
+    def test_closest_future_occurrence_matches_legacy(self):
+        rng = random.Random(20200101)
+        for _ in range(self.EXAMPLES):
+            case = self.random_case(rng)
+            day, start, recurrence = case
+            occurrence = get_closest_future_occurrence(day, start, recurrence)
+            self.assertGreaterEqual(occurrence, day, case)
+            if day >= start:
+                self.assertEqual(occurrence, legacy_get_closest_future_occurrence(*case), case)
+            self.assertIs(is_occurrence(*case), legacy_is_occurrence(*case), case)
+
+    def test_closest_future_occurrence_before_start(self):
+        self.assertEqual(get_closest_future_occurrence(date(2020, 1, 1), date(2020, 1, 10), timedelta(2)),
+                         date(2020, 1, 10))
+        self.assertEqual(get_closest_future_occurrence(date(2020, 1, 1), date(2020, 1, 10), timedelta(14)),
+                         date(2020, 1, 8))
+
+    def test_get_occurrences(self):
+        rng = random.Random(20200102)
+        for _ in range(self.EXAMPLES // 10):
+            day, start, recurrence = self.random_case(rng)
+            recurrence = rng.choice([recurrence, None])
+            weekdays = rng.choice([None, set(rng.sample(range(1, 8), rng.randrange(8)))])
+            date_to = day + timedelta(rng.randrange(60))
+            expected = [day + timedelta(i) for i in range((date_to - day).days + 1)]
+            expected = [d for d in expected if legacy_is_occurrence(d, start, recurrence)
+                        and (weekdays is None or d.isoweekday() in weekdays)]
+            self.assertEqual(get_occurrences(start, recurrence, day, date_to, weekdays), expected,
+                             (start, recurrence, day, date_to, weekdays))
+
+
+class BulkOccurrenceTests(TestCase):
+
+    def setUp(self):
+        rng = random.Random(20200103)
+        self.starts, self.periods, self.ends, self.weekdays_masks = [], [], [], []
+        for _ in range(300):
+            start = date(2020, 1, 1) + timedelta(rng.randrange(-400, 400))
+            self.starts.append(start.toordinal())
+            self.periods.append(rng.choice([None, 0, rng.randrange(1, 30), 7 * rng.randrange(1, 5)]))
+            self.ends.append(rng.choice([None, start.toordinal() + rng.randrange(400)]))
+            self.weekdays_masks.append(rng.choice([None, rng.randrange(1 << 7)]))
+        self.date_from, self.date_to = date(2019, 12, 1), date(2020, 3, 1)
+
+    def expected_matrix(self, use_weekdays):
+        days = [self.date_from + timedelta(i) for i in range((self.date_to - self.date_from).days + 1)]
+        return [[start <= day.toordinal() <= (end or day.toordinal())
+                 and (not use_weekdays or mask is None or bool(mask & 1 << day.weekday()))
+                 and is_occurrence(day, date.fromordinal(start), timedelta(period) if period else None)
+                 for day in days]
+                for start, period, end, mask in zip(self.starts, self.periods, self.ends, self.weekdays_masks)]
+
+    def assert_matches_is_occurrence(self):
+        for weekdays_masks in (None, self.weekdays_masks):
+            expected = self.expected_matrix(weekdays_masks is not None)
+            matrix = occurances.occurrence_matrix(self.starts, self.periods, self.ends, self.date_from, self.date_to,
+                                                  weekdays_masks)
+            self.assertEqual([list(map(bool, row)) for row in matrix], expected)
+            mask = occurances.occurrence_mask(self.starts, self.periods, self.ends, self.date_to, weekdays_masks)
+            self.assertEqual(list(map(bool, mask)), [row[-1] for row in expected])
+
+    def test_pure_python(self):
+        with mock.patch.object(occurances, 'numpy', None):
+            self.assert_matches_is_occurrence()
+
+    @skipIf(occurances.numpy is None, 'NumPy is not installed')
+    def test_numpy(self):
+        self.assert_matches_is_occurrence()
+
+    def test_empty(self):
+        self.assertEqual(len(occurances.occurrence_mask([], [], [], self.date_from)), 0)
+
 
 class RegistrationTests(APITestCase):
     USERNAME = 'test-user'
@@ -107,6 +250,68 @@ class RegistrationTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
 
+class UserCollectionsTests(APITestCase):
+
+    def setUp(self):
+        self.superuser_credentials = dict(username='admin', password='admin')
+        self.superuser = User.objects.create_superuser(**self.superuser_credentials)
+        self.client.login(**self.superuser_credentials)
+
+    def create_users(self, count):
+        for _ in range(count):
+            user = User.objects.create_user(username=f'user{User.objects.count()}', password='user')
+            subject = models.Subject.objects.create(title='Subject', color='000000', owner=user)
+            models.Subject.objects.create(title='Another subject', color='000000', owner=user)
+            models.Task.objects.create(title='Task', owner=user)
+            class_type = models.ClassType.objects.create(title='Class type', owner=user)
+            models.Class.objects.create(subject=subject, type=class_type, owner=user)
+
+    def test_ids(self):
+        self.create_users(2)
+        with self.assertNumQueries(9):
+            response = self.client.get(reverse('user-list'))
+        self.create_users(3)
+        with self.assertNumQueries(9):
+            response = self.client.get(reverse('user-list'))
+        user = User.objects.get(username='user5')
+        data = response.data['results'][-1]
+        self.assertEqual(data['subjects'], [subject.id for subject in user.subjects.all()])
+        self.assertEqual(data['tasks'], [task.id for task in user.tasks.all()])
+        self.assertEqual(data['times'], [])
+
+    def test_counts(self):
+        self.create_users(3)
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('user-list'), {'collections': 'counts'})
+        self.assertEqual({key: value for key, value in response.data['results'][-1].items() if key.endswith('_count')},
+                         {'subjects_count': 2, 'teachers_count': 0, 'class_types_count': 1, 'classes_count': 1,
+                          'times_count': 0, 'tasks_count': 1})
+        self.assertNotIn('subjects', response.data['results'][-1])
+        response = self.client.get(reverse('user-detail', args=[self.superuser.id]), {'collections': 'counts'})
+        self.assertEqual(response.data['subjects_count'], 0)
+
+    def test_delete(self):
+        self.create_users(1)
+        user = User.objects.get(username='user1')
+        class_ = models.Class.objects.get(owner=user)
+        class_.teacher = models.Teacher.objects.create(name='Teacher', owner=user)
+        class_.save()
+        models.Time.objects.create(**{'class': class_}, period=7, date_start='2020-01-01',
+                                   time_start='10:00', time_end='11:00', owner=user)
+        response = self.client.delete(reverse('user-detail', args=[user.id]))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        for model in [*models.SYNCED_MODELS, models.Tombstone, models.ChangeSequence]:
+            self.assertFalse(model.objects.filter(owner_id=user.id).exists())
+
+    def test_none(self):
+        self.create_users(3)
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('user-list'), {'collections': 'none'})
+        self.assertEqual(set(response.data['results'][0]), {'url', 'username', 'is_staff'})
+        response = self.client.get(reverse('user-list'), {'collections': 'all'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
 class LoginTests(APITestCase):
 
     def test_login(self):
@@ -174,14 +379,14 @@ class SubjectTests(APITestCase):
         self.client.login(**self.superuser_credentials)
         response = self.client.get(reverse('subject-list'))
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, [
+        self.assertEqual(response.data['results'], [
             serializers.SubjectSerializer().to_representation(admin_subject),
             serializers.SubjectSerializer().to_representation(regular_subject)
         ])
         self.client.login(**self.user_credentials)
         response = self.client.get(reverse('subject-list'))
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, [
+        self.assertEqual(response.data['results'], [
             serializers.SubjectSerializer().to_representation(regular_subject)
         ])
 
@@ -222,14 +427,14 @@ class TeacherTests(APITestCase):
         self.client.login(**self.superuser_credentials)
         response = self.client.get(reverse('teacher-list'))
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, [
+        self.assertEqual(response.data['results'], [
             serializers.TeacherSerializer().to_representation(admin_teacher),
             serializers.TeacherSerializer().to_representation(regular_teacher)
         ])
         self.client.login(**self.user_credentials)
         response = self.client.get(reverse('teacher-list'))
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, [
+        self.assertEqual(response.data['results'], [
             serializers.TeacherSerializer().to_representation(regular_teacher)
         ])
 
@@ -262,19 +467,20 @@ class ClassTypeTests(APITestCase):
         self.client.login(**self.superuser_credentials)
         response = self.client.get(reverse('class-type-list'))
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, [
+        self.assertEqual(response.data['results'], [
             serializers.ClassTypeSerializer().to_representation(admin_class_type),
             serializers.ClassTypeSerializer().to_representation(regular_class_type)
         ])
         self.client.login(**self.user_credentials)
         response = self.client.get(reverse('class-type-list'))
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, [
+        self.assertEqual(response.data['results'], [
             serializers.ClassTypeSerializer().to_representation(regular_class_type)
         ])
 
 
 class ClassesTests(APITestCase):
+    client_class = OnCommitAPIClient
 
     def setUp(self):
         self.superuser_credentials = dict(username='admin', password='admin')
@@ -360,17 +566,60 @@ class ClassesTests(APITestCase):
         self.client.login(**self.superuser_credentials)
         response = self.client.get(reverse('class-list'))
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, [
+        self.assertEqual(response.data['results'], [
             serializers.ClassSerializer().to_representation(admin_class),
             serializers.ClassSerializer().to_representation(regular_class)
         ])
         self.client.login(**self.user_credentials)
         response = self.client.get(reverse('class-list'))
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, [
+        self.assertEqual(response.data['results'], [
             serializers.ClassSerializer().to_representation(regular_class)
         ])
 
+    def test_nested_upsert(self):
+        subject = models.Subject.objects.create(title='Subject', color='000000', owner=self.user)
+        models.Subject.objects.create(title='Subject', color='000000', owner=self.superuser)
+        body = {'subject': {'title': 'Subject', 'color': 'ff0000'}, 'type': {'title': 'Type'},
+                'teacher': {'name': 'Teacher', 'phone': '', 'email': ''}}
+        response = self.client.post(reverse('class-list'), body, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['subject']['id'], subject.id)
+        self.assertEqual(response.data['subject']['color'], 'ff0000')
+        self.assertEqual(models.Subject.objects.get(id=subject.id).color, 'ff0000')
+        self.assertEqual(models.Subject.objects.filter(owner=self.superuser).get().color, '000000')
+        response = self.client.post(reverse('class-list'), body, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(models.Class.objects.filter(subject=subject).count(), 2)
+        self.assertEqual(models.Teacher.objects.count(), 1)
+        response = self.client.post(reverse('class-list'), dict(body, subject={'color': 'ff0000'}), format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        # created and updated objects change the versions of their resources, unchanged ones don't
+        resolver = bulk.Resolver()
+        for values, changed in (({'title': 'Subject', 'color': '00ff00'}, True),
+                                ({'title': 'Subject', 'color': '00ff00'}, False),
+                                ({'title': 'Another subject', 'color': '000000'}, True)):
+            version = caching.get_version('subject', self.user.id)
+            with run_on_commit():
+                resolver.resolve(models.Subject, [(self.user, values)])
+            self.assertEqual(caching.get_version('subject', self.user.id) != version, changed)
+
+    def test_nested_insert_race(self):
+        """A subject inserted by a concurrent request between the lookup and the insert is used"""
+        fetch = bulk.Resolver.fetch
+
+        def fetch_and_insert(resolver, model, keys):
+            fetch(resolver, model, keys)
+            if model is models.Subject and not models.Subject.objects.exists():
+                models.Subject.objects.create(title='Subject', color='000000', owner=self.user)
+
+        body = {'subject': {'title': 'Subject', 'color': '000000'}, 'type': {'title': 'Type'}}
+        with mock.patch.object(bulk.Resolver, 'fetch', fetch_and_insert):
+            response = self.client.post(reverse('class-list'), body, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['subject']['id'], models.Subject.objects.get().id)
+
 
 class TimeTests(APITestCase):
 
@@ -401,17 +650,180 @@ class TimeTests(APITestCase):
         self.client.login(**self.superuser_credentials)
         response = self.client.get(reverse('time-list'))
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, times)
+        self.assertEqual(response.data['results'], times)
         self.client.login(**self.user_credentials)
         response = self.client.get(reverse('time-list'))
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, [times[0]])
+        self.assertEqual(response.data['results'], [times[0]])
+
+    def test_days_of_week(self):
+        url = reverse('time-list') + '?allow_conflicts=1'  # the same slot is posted repeatedly
+        subject = models.Subject.objects.create(title='Subject', color='000000', owner=self.user)
+        class_type = models.ClassType.objects.create(title='Class type', owner=self.user)
+        class_ = models.Class.objects.create(subject=subject, type=class_type, owner=self.user)
+        body = {'class': class_.id, 'period': '7', 'date_start': '2020-01-01', 'time_start': '10:00',
+                'time_end': '11:00'}
+        for days_of_week, expected_weekdays, expected_days_of_week in (
+                ('1,2,3', 0b0000111, '1,2,3'),
+                ('7, 1', 0b1000001, '1,7'),
+                ('35', 0b0010100, '3,5'),
+                (None, None, None)):
+            response = self.client.post(url, dict(body, days_of_week=days_of_week), format='json')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.assertEqual(response.data['days_of_week'], expected_days_of_week)
+            self.assertEqual(models.Time.objects.get(id=response.data['id']).weekdays, expected_weekdays)
+        for days_of_week in ('10', '1-5', 'mon', ''):
+            response = self.client.post(url, dict(body, days_of_week=days_of_week), format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_period(self):
+        url = reverse('time-list') + '?allow_conflicts=1'  # the same slot is posted repeatedly
+        subject = models.Subject.objects.create(title='Subject', color='000000', owner=self.user)
+        class_type = models.ClassType.objects.create(title='Class type', owner=self.user)
+        class_ = models.Class.objects.create(subject=subject, type=class_type, owner=self.user)
+        body = {'class': class_.id, 'days_of_week': '1', 'date_start': '2020-01-01', 'time_start': '10:00',
+                'time_end': '11:00'}
+        for period, expected_period in (('14', 14), (7, 7), (None, None)):
+            response = self.client.post(url, dict(body, period=period), format='json')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.assertEqual(response.data['period'], expected_period)
+            self.assertEqual(models.Time.objects.get(id=response.data['id']).period, expected_period)
+        for period in ('junk', '1.5', 0, -7):
+            response = self.client.post(url, dict(body, period=period), format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ThreadPoolASGIHandlerTests(TestCase):
+
+    def test_views_run_in_pool(self):
+        handler = ThreadPoolASGIHandler(max_workers=2)
+        threads = []
+        get_response_in_thread = handler.get_response_in_thread
+
+        def record_thread(request):
+            threads.append(threading.current_thread().name)
+            return get_response_in_thread(request)
+
+        async def get(path):
+            scope = {'type': 'http', 'method': 'GET', 'path': path, 'query_string': b'', 'root_path': '',
+                     'headers': [(b'host', b'localhost')], 'scheme': 'http', 'server': ('localhost', 80)}
+            messages = []
+
+            async def receive():
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+            async def send(message):
+                messages.append(message)
+
+            await handler(scope, receive, send)
+            return messages[0]['status']
+
+        async def get_all():
+            return await asyncio.gather(*[get(reverse('rest_framework:login')) for _ in range(4)])
+
+        with mock.patch.object(handler, 'get_response_in_thread', record_thread):
+            self.assertEqual(asyncio.run(get_all()), [200] * 4)
+        self.assertEqual(len(threads), 4)
+        self.assertTrue(all(name.startswith('asgi') for name in threads))
+
+
+class ThreadPoolASGIStreamingTests(TransactionTestCase):
+    """Streaming responses query the database as they are read, which only the pool's threads may do"""
+
+    def test_streaming_responses(self):
+        user = User.objects.create_user(username='user', password='user')
+        subject = models.Subject.objects.create(title='Subject', color='000000', owner=user)
+        class_ = models.Class.objects.create(subject=subject, owner=user)
+        models.Time.objects.create(**{'class': class_}, period=7, date_start='2020-01-01', time_start='10:00',
+                                   time_end='11:30', owner=user)
+        self.client.login(username='user', password='user')
+        cookie = f'sessionid={self.client.cookies["sessionid"].value}'.encode()
+        handler = ThreadPoolASGIHandler(max_workers=2)
+
+        async def get(path):
+            scope = {'type': 'http', 'method': 'GET', 'path': path, 'query_string': b'', 'root_path': '',
+                     'headers': [(b'host', b'localhost'), (b'cookie', cookie)], 'scheme': 'http',
+                     'server': ('localhost', 80)}
+            messages = []
+
+            async def receive():
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+            async def send(message):
+                messages.append(message)
+
+            await handler(scope, receive, send)
+            return messages[0]['status'], b''.join(message.get('body', b'') for message in messages[1:])
+
+        status_code, body = asyncio.run(get(reverse(views.calendar_feed)))
+        self.assertEqual(status_code, 200)
+        self.assertIn(b'SUMMARY:Subject', body)
+        status_code, body = asyncio.run(get(reverse('time-export')))
+        self.assertEqual(status_code, 200)
+        self.assertEqual([time['class'] for time in json.loads(body)], [class_.id])
+
+
+class SQLiteProfileTests(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def connect(self, **options):
+        wrapper = DatabaseWrapper({**connection.settings_dict, 'NAME': os.path.join(self.directory.name, 'db.sqlite3'),
+                                   'OPTIONS': {**connection.settings_dict['OPTIONS'], **options}}, alias='profile')
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def test_init_command(self):
+        with self.connect().cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+    def test_transactions_take_write_lock(self):
+        writer, other = self.connect(), self.connect(timeout=0)
+        writer.ensure_connection()
+        other.ensure_connection()
+        writer._start_transaction_under_autocommit()
+        with self.assertRaisesMessage(OperationalError, 'database is locked'):
+            other._start_transaction_under_autocommit()
+        writer.rollback()
+
+    def test_invalid_transaction_mode(self):
+        with self.assertRaises(ImproperlyConfigured):
+            self.connect(transaction_mode='LATER').ensure_connection()
+
+
+class RepresentationTests(TestCase):
+
+    def test_same_as_serializers(self):
+        user = User.objects.create_user(username='user', password='user')
+        subject = models.Subject.objects.create(title='Subject', color='000000', owner=user)
+        class_type = models.ClassType.objects.create(title='Тип', is_custom=False, owner=user)
+        teacher = models.Teacher.objects.create(name='Teacher', phone='+7', email='', owner=user)
+        for teacher in (teacher, None):
+            class_ = models.Class.objects.create(subject=subject, type=class_type, teacher=teacher, owner=user)
+            time = models.Time.objects.create(**{'class': class_}, date_start='2020-01-01', time_start='10:00:00.5',
+                                              time_end='11:30', owner=user)
+            class_ = models.Class.objects.select_related('subject__owner', 'type__owner').get(id=class_.id)
+            renderer = JSONRenderer()
+            self.assertEqual(renderer.render(views.CLASS_REPRESENTATION(class_)),
+                             renderer.render(serializers.ClassSerializer(class_).data))
+            time = models.Time.objects.get(id=time.id)
+            self.assertEqual(renderer.render(views.TIME_REPRESENTATION(time)),
+                             renderer.render({name: serializers.TimeSerializer(time).data[name]
+                                              for name in ('time_start', 'time_end')}))
 
 
 class ScheduleTests(APITestCase):
+    client_class = OnCommitAPIClient
+    SCHEDULE_QUERIES = 3
 
     def setUp(self):
         """There are 3 classes in 2020 each week: mon tue - class1, tue wed - class2, wed thu - class3"""
+        caching.get_cache().clear()
         user = User.objects.create_user(username='test-user', password='test-password')
         user.save()
         self.client.login(username='test-user', password='test-password')
@@ -483,10 +895,866 @@ class ScheduleTests(APITestCase):
             self.assertEqual(response.status_code, status.HTTP_200_OK)
             self.assertEqual(response.data, schedule)
 
+    def test_schedule_query_count(self):
+        """A fixed number of queries, however many classes the day has"""
+        teacher = models.Teacher(name='Test Teacher', owner=models.Subject.objects.first().owner)
+        teacher.save()
+        models.Class.objects.update(teacher=teacher)
+        for date in ('2020-01-03', '2020-01-06', '2020-01-07'):
+            with self.assertNumQueries(self.SCHEDULE_QUERIES):
+                response = self.client.get(reverse(views.schedule, kwargs={'date': date}))
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        with self.assertNumQueries(self.SCHEDULE_QUERIES):
+            response = self.client.get(reverse(views.schedule_range, kwargs={'start': '2020-01-01',
+                                                                             'end': '2020-01-31'}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_schedule_cache(self):
+        url = reverse(views.schedule, kwargs={'date': '2020-01-07'})
+        with self.assertNumQueries(self.SCHEDULE_QUERIES):
+            self.assertEqual(self.client.get(url).data, [self.schedule_item1, self.schedule_item2])
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get(url).data, [self.schedule_item1, self.schedule_item2])
+
+        subject = models.Subject.objects.get(title='Subject 1')
+        response = self.client.patch(reverse('subject-detail', args=[subject.id]), {'color': 'ff0000'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get(url).data[0]['subject']['color'], 'ff0000')
+
+        response = self.client.delete(reverse('class-detail', args=[self.schedule_item2['id']]))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(len(self.client.get(url).data), 1)
+
     def test_schedule_invalid_date(self):
         response = self.client.get(reverse(views.schedule, kwargs={'date': '2020-13-32'}))
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
+    def test_schedule_range(self):
+        response = self.client.get(reverse(views.schedule_range, kwargs={'start': '2019-12-30', 'end': '2020-02-02'}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 35)
+        for date, schedule in response.data.items():
+            day_response = self.client.get(reverse(views.schedule, kwargs={'date': date}))
+            self.assertEqual(schedule, day_response.data)
+        self.assertEqual(response.data['2019-12-30'], [])
+        self.assertEqual(response.data['2020-01-07'], [self.schedule_item1, self.schedule_item2])
+
+    def test_schedule_range_invalid_dates(self):
+        for start, end in (('2020-01-02', '2020-01-01'), ('2020-01-01', '2020-13-32'), ('2020-01-01', '2022-01-01')):
+            response = self.client.get(reverse(views.schedule_range, kwargs={'start': start, 'end': end}))
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class MaterializedScheduleTests(ScheduleTests):
+    """Runs the schedule tests against occurrences materialized around 2020-01-15"""
+    SCHEDULE_QUERIES = 4
+
+    def setUp(self):
+        patcher = mock.patch('schedule_server.materialization.timezone.localdate', return_value=date(2020, 1, 15))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        super().setUp()
+        self.user = User.objects.get(username='test-user')
+        materialization.rebuild_window(self.user.id)
+
+    def test_rebuild_window(self):
+        window = models.OccurrenceWindow.objects.get(owner=self.user)
+        self.assertEqual((window.date_from, window.date_to), (date(2019, 12, 15), date(2021, 1, 15)))
+        # 2020 has 52 mondays and tuesdays and 53 wednesdays and thursdays
+        self.assertEqual(models.Occurrence.objects.filter(owner=self.user).count(), (52 + 52) + (52 + 53) + (53 + 53))
+        with mock.patch('schedule_server.materialization.timezone.localdate', return_value=date(2020, 3, 1)):
+            self.client.get(reverse(views.schedule, kwargs={'date': '2021-03-01'}))
+        window.refresh_from_db()
+        self.assertEqual(window.date_to, date(2021, 3, 2))
+
+    def test_time_writes(self):
+        url = reverse(views.schedule, kwargs={'date': '2020-01-10'})
+        self.assertEqual(self.client.get(url).data, [])
+        class_ = models.Class.objects.first()
+        response = self.client.post(reverse('time-list'), {
+            'class': class_.id, 'period': '7', 'days_of_week': '5',
+            'date_start': '2020-01-01', 'date_end': '2020-12-31', 'time_start': '09:00', 'time_end': '10:00',
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        time = models.Time.objects.get(id=response.data['id'])
+        self.assertEqual(self.client.get(url).data, [self.build_schedule_item(class_, time)])
+
+        detail_url = reverse('time-detail', args=[time.id])
+        response = self.client.patch(detail_url, {'days_of_week': '4'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.client.get(url).data, [])
+        self.assertEqual(len(self.client.get(reverse(views.schedule, kwargs={'date': '2020-01-09'})).data), 2)
+
+        response = self.client.delete(detail_url)
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(models.Occurrence.objects.filter(time_id=time.id))
+
+
+class DayTests(APITestCase):
+    client_class = OnCommitAPIClient
+
+    def setUp(self):
+        caching.get_cache().clear()
+        self.user = User.objects.create_user(username='user', password='user')
+        self.client.login(username='user', password='user')
+        self.classes = []
+        for i, (days_of_week, time_start) in enumerate([('1', '12:00'), ('1', '10:00'), ('2', '10:00')]):
+            subject = models.Subject.objects.create(title=f'Subject {i}', color='000000', owner=self.user)
+            class_ = models.Class.objects.create(subject=subject, owner=self.user)
+            models.Time.objects.create(**{'class': class_}, period=7, days_of_week=days_of_week, time_start=time_start,
+                                       time_end='13:30', date_start='2020-01-01', owner=self.user)
+            self.classes.append(class_)
+        self.url = reverse(views.day, kwargs={'date': '2020-01-06'})
+
+    def create_task(self, class_index, due_date='2020-01-06', **kwargs):
+        class_ = None if class_index is None else self.classes[class_index]
+        return models.Task.objects.create(title='Task', due_date=due_date, owner=self.user, **{'class': class_},
+                                          **kwargs).id
+
+    def test_day(self):
+        tasks = [self.create_task(0, priority=1), self.create_task(0, priority=3), self.create_task(0, '2020-01-07'),
+                 self.create_task(1, is_completed=True), self.create_task(None), self.create_task(2)]
+        other_user = User.objects.create_user(username='other', password='other')
+        models.Task.objects.create(title='Other task', due_date='2020-01-06', owner=other_user)
+        with self.assertNumQueries(4):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['date'], '2020-01-06')
+        self.assertEqual([(item['id'], [task['id'] for task in item['tasks']]) for item in response.data['schedule']],
+                         [(self.classes[1].id, [tasks[3]]), (self.classes[0].id, [tasks[1], tasks[0]])])
+        self.assertEqual([task['id'] for task in response.data['tasks']], [tasks[4], tasks[5]])
+        schedule = self.client.get(reverse(views.schedule, kwargs={'date': '2020-01-06'})).data
+        self.assertEqual([{key: value for key, value in item.items() if key != 'tasks'}
+                          for item in response.data['schedule']], schedule)
+
+    def test_task_writes(self):
+        etag = self.client.get(self.url)['ETag']
+        self.client.post(reverse('task-list'), {'title': 'Task', 'due_date': '2020-01-06', 'class': self.classes[0].id})
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['schedule'][1]['tasks']), 1)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_invalid_date(self):
+        response = self.client.get(reverse(views.day, kwargs={'date': '2020-13-01'}))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ConditionalGetTests(APITestCase):
+    client_class = OnCommitAPIClient
+
+    def setUp(self):
+        caching.get_cache().clear()
+        self.user_credentials = dict(username='user', password='user')
+        self.user = User.objects.create_user(**self.user_credentials)
+        self.other_user = User.objects.create_user(username='other', password='other')
+        self.client.login(**self.user_credentials)
+        self.subject = models.Subject.objects.create(title='Subject', color='000000', owner=self.user)
+        self.class_type = models.ClassType.objects.create(title='Class type', owner=self.user)
+        self.class_ = models.Class.objects.create(subject=self.subject, type=self.class_type, owner=self.user)
+
+    def assert_not_modified(self, url, etag, queries=2):
+        """Only the session and the user are queried, and a detail's object for its permissions"""
+        with self.assertNumQueries(queries):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+    def assert_modified(self, url, etag):
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        return response['ETag']
+
+    def test_list(self):
+        for name in ('subject', 'teacher', 'class-type', 'class', 'time', 'task'):
+            url = reverse(f'{name}-list')
+            etag = self.client.get(url)['ETag']
+            self.assert_not_modified(url, etag)
+        url = reverse('subject-list')
+        etag = self.client.get(url)['ETag']
+        self.client.post(url, {'title': 'Another subject', 'color': '000000'})
+        etag = self.assert_modified(url, etag)
+        self.assert_not_modified(url, etag)
+
+    def test_writes_of_other_users_keep_etags(self):
+        url = reverse('subject-list')
+        etag = self.client.get(url)['ETag']
+        self.client.login(username='other', password='other')
+        self.client.post(url, {'title': 'Other subject', 'color': '000000'})
+        self.client.login(**self.user_credentials)
+        self.assert_not_modified(url, etag)
+
+    def test_dependent_resources(self):
+        urls = [reverse('class-list'), reverse('class-detail', args=[self.class_.id]),
+                reverse(views.schedule, kwargs={'date': '2020-01-01'})]
+        etags = [self.client.get(url)['ETag'] for url in urls]
+        self.client.patch(reverse('subject-detail', args=[self.subject.id]), {'color': 'ff0000'})
+        etags = [self.assert_modified(url, etag) for url, etag in zip(urls, etags)]
+        self.client.post(reverse('task-list'), {'title': 'Task'})
+        for url, etag, queries in zip(urls, etags, (2, 3, 2)):
+            self.assert_not_modified(url, etag, queries)
+
+    def test_nested_writes_of_classes(self):
+        body = {'subject': {'title': 'New subject', 'color': '000000'}, 'type': {'title': 'New type'},
+                'teacher': {'name': 'New teacher', 'phone': '', 'email': ''}}
+        for post in (lambda: self.client.post(reverse('class-list'), body, format='json'),
+                     lambda: self.client.post(reverse('class-bulk'), [dict(body, location='Room')], format='json')):
+            urls = [reverse('subject-list'), reverse('class-type-list'), reverse('teacher-list')]
+            etags = [self.client.get(url)['ETag'] for url in urls]
+            self.assertEqual(post().status_code, status.HTTP_201_CREATED)
+            for url, etag in zip(urls, etags):
+                self.assert_modified(url, etag)
+
+    def test_retrieve_checks_permissions(self):
+        url = reverse('subject-detail', args=[self.subject.id])
+        etag = self.client.get(url)['ETag']
+        self.client.login(username='other', password='other')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class OwnerQueryTests(APITestCase):
+
+    def setUp(self):
+        caching.get_cache().clear()
+        self.superuser_credentials = dict(username='admin', password='admin')
+        self.user_credentials = dict(username='user', password='user')
+        self.superuser = User.objects.create_superuser(**self.superuser_credentials)
+        self.user = User.objects.create_user(**self.user_credentials)
+        self.client.login(**self.user_credentials)
+        for user in (self.user, self.superuser):
+            class_type = models.ClassType.objects.create(title='Class type', owner=user)
+            for i in range(3):
+                subject = models.Subject.objects.create(title=f'Subject {i}', color='000000', owner=user)
+                models.Class.objects.create(subject=subject, type=class_type, owner=user)
+
+    def test_list(self):
+        """Only the session, the user and the page are queried"""
+        for name in ('subject', 'class'):
+            with self.assertNumQueries(3):
+                response = self.client.get(reverse(f'{name}-list'))
+            self.assertEqual({item['owner'] for item in response.data['results']}, {'user'})
+        self.client.login(**self.superuser_credentials)
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('class-list'))
+        self.assertEqual([item['subject']['owner'] for item in response.data['results']], ['user'] * 3 + ['admin'] * 3)
+
+    def test_retrieve(self):
+        subject = models.Subject.objects.filter(owner=self.user).first()
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('subject-detail', args=[subject.id]))
+        self.assertEqual(response.data['owner'], 'user')
+        response = self.client.patch(reverse('subject-detail', args=[subject.id]), {'color': 'ff0000'})
+        self.assertEqual(response.data['owner'], 'user')
+
+    def test_owners_are_loaded_once(self):
+        subjects = list(models.Subject.objects.all())
+        with self.assertNumQueries(2):
+            data = serializers.SubjectSerializer(subjects, many=True).data
+        self.assertEqual([subject['owner'] for subject in data], ['user'] * 3 + ['admin'] * 3)
+
+
+class PaginationTests(APITestCase):
+
+    def setUp(self):
+        caching.get_cache().clear()
+        self.user_credentials = dict(username='user', password='user')
+        self.user = User.objects.create_user(**self.user_credentials)
+        self.client.login(**self.user_credentials)
+
+    def get_pages(self, url):
+        ids = []
+        while url is not None:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(response.data['results']), 2)
+            ids.extend(item['id'] for item in response.data['results'])
+            url = response.data['next']
+        return ids
+
+    def test_pages_follow_ordering(self):
+        due_dates = ['2020-01-02', None, '2020-01-01', '2020-01-02', None, '2020-01-03', '2020-01-02']
+        for i, due_date in enumerate(due_dates):
+            models.Task.objects.create(title=f'Task {i}', due_date=due_date, owner=self.user)
+        expected = list(models.Task.objects.order_by('-due_date', 'pk').values_list('id', flat=True))
+        self.assertEqual(self.get_pages(reverse('task-list') + '?page_size=2'), expected)
+
+        subject = models.Subject.objects.create(title='Subject', color='000000', owner=self.user)
+        class_type = models.ClassType.objects.create(title='Class type', owner=self.user)
+        class_ = models.Class.objects.create(subject=subject, type=class_type, owner=self.user)
+        for time_start in ('12:00', '10:00', '12:00', '08:00', '10:00'):
+            models.Time.objects.create(**{'class': class_}, date_start='2020-01-01', time_start=time_start,
+                                       time_end='13:00', owner=self.user)
+        expected = list(models.Time.objects.order_by('time_start', 'pk').values_list('id', flat=True))
+        self.assertEqual(self.get_pages(reverse('time-list') + '?page_size=2'), expected)
+
+    def test_page_size(self):
+        for i in range(5):
+            models.Subject.objects.create(title=f'Subject {i}', color='000000', owner=self.user)
+        response = self.client.get(reverse('subject-list'))
+        self.assertEqual(len(response.data['results']), 5)
+        self.assertIsNone(response.data['next'])
+        response = self.client.get(reverse('subject-list'), {'page_size': 3})
+        self.assertEqual(len(response.data['results']), 3)
+        with self.assertNumQueries(3):
+            response = self.client.get(response.data['next'])
+        self.assertEqual([subject['title'] for subject in response.data['results']], ['Subject 3', 'Subject 4'])
+
+    def test_invalid_cursor(self):
+        for cursor in ('junk', 'WyJqdW5rIiwgMV0=', 'WzFd'):
+            response = self.client.get(reverse('subject-list'), {'cursor': cursor})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ExportTests(APITestCase):
+
+    def setUp(self):
+        self.superuser_credentials = dict(username='admin', password='admin')
+        self.user_credentials = dict(username='user', password='user')
+        self.superuser = User.objects.create_superuser(**self.superuser_credentials)
+        self.user = User.objects.create_user(**self.user_credentials)
+        self.client.login(**self.user_credentials)
+        for user in (self.user, self.superuser):
+            subject = models.Subject.objects.create(title='Subject', color='000000', owner=user)
+            class_type = models.ClassType.objects.create(title='Class type', owner=user)
+            for i in range(3):
+                models.Class.objects.create(subject=subject, type=class_type, location=f'Room {i}', owner=user)
+
+    def get_export(self, url, queries):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        with self.assertNumQueries(queries):
+            return response['Content-Type'], b''.join(response.streaming_content).decode()
+
+    def test_json(self):
+        classes = self.client.get(reverse('class-list')).data['results']
+        with mock.patch.object(export, 'CHUNK_SIZE', 2):
+            content_type, content = self.get_export(reverse('class-export'), 1)
+        self.assertEqual(content_type, 'application/json')
+        self.assertEqual(json.loads(content), json.loads(json.dumps(classes)))
+        self.assertEqual(self.get_export(reverse('class-type-export'), 1)[1], '[' + ','.join(
+            export.render(serializers.ClassTypeSerializer(class_type).data).decode()
+            for class_type in models.ClassType.objects.filter(owner=self.user)) + ']')
+
+    def test_ndjson(self):
+        self.client.login(**self.superuser_credentials)
+        content_type, content = self.get_export(reverse('class-export') + '?ndjson=1', 1)
+        self.assertEqual(content_type, 'application/x-ndjson')
+        self.assertEqual([json.loads(line)['location'] for line in content.splitlines()],
+                         ['Room 0', 'Room 1', 'Room 2'] * 2)
+        self.assertTrue(content.endswith('\n'))
+
+    def test_empty(self):
+        self.assertEqual(self.get_export(reverse('task-export'), 1)[1], '[]')
+        self.assertEqual(self.get_export(reverse('task-export') + '?ndjson=1', 1)[1], '')
+
+
+class BulkTests(APITestCase):
+
+    def setUp(self):
+        caching.get_cache().clear()
+        self.user_credentials = dict(username='user', password='user')
+        self.user = User.objects.create_user(**self.user_credentials)
+        self.other_user = User.objects.create_user(username='other', password='other')
+        self.client.login(**self.user_credentials)
+        models.Subject.objects.create(title='Subject 0', color='000000', owner=self.user)
+
+    def create_classes(self, count):
+        body = [{'subject': {'title': f'Subject {i % 5}', 'color': '000000'},
+                 'type': {'title': f'Type {i % 2}'},
+                 'location': f'Room {i}'} for i in range(count)]
+        return self.client.post(reverse('class-bulk'), body, format='json')
+
+    def test_create(self):
+        response = self.create_classes(10)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        classes = models.Class.objects.select_related('subject', 'type').order_by('id')
+        self.assertEqual(response.data, [serializers.ClassSerializer(class_).data for class_ in classes])
+        self.assertEqual([class_.subject.title for class_ in classes], [f'Subject {i % 5}' for i in range(10)])
+        self.assertEqual(models.Subject.objects.count(), 5)
+        self.assertEqual(models.ClassType.objects.count(), 2)
+        self.assertEqual(len({class_.version for class_ in classes}), 10)
+
+    def test_conflicting_nested(self):
+        body = [{'subject': {'title': 'Subject', 'color': '000000'}, 'type': {'title': 'Type'}},
+                {'subject': {'title': 'Subject', 'color': '000000'}, 'type': {'title': 'Type', 'is_custom': True}},
+                {'subject': {'title': 'Subject', 'color': 'ff0000'}, 'type': {'title': 'Type', 'is_custom': False}}]
+        response = self.client.post(reverse('class-bulk'), body, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, [{}, {}, {
+            'subject': {'color': ['Conflicts with item 0, which has the same title.']},
+            'type': {'is_custom': ['Conflicts with item 1, which has the same title.']},
+        }])
+        self.assertFalse(models.ClassType.objects.exists())
+        response = self.client.post(reverse('class-bulk'), body[:1] + [{**body[1], 'type': {'title': 'Type'}}],
+                                    format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_create_query_count(self):
+        """The queries do not depend on the number of items, up to a batch of the database"""
+        with CaptureQueriesContext(connection) as queries:
+            self.create_classes(10)
+        self.client.login(username='other', password='other')
+        # the first write of a user creates their change sequence
+        models.ChangeSequence.objects.create(owner=self.other_user)
+        with self.assertNumQueries(len(queries)):
+            self.create_classes(100)
+        class_ids = list(models.Class.objects.filter(owner=self.other_user).values_list('id', flat=True))
+        # times on distinct days and hours, which pass the conflict check
+        body = [{'class': class_id, 'period': 7, 'days_of_week': str(i % 7 + 1), 'date_start': '2020-01-01',
+                 'time_start': f'{8 + i // 7}:00', 'time_end': f'{9 + i // 7}:00'}
+                for i, class_id in enumerate(class_ids[:60])]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('time-bulk'), body[:10], format='json')
+        with self.assertNumQueries(len(queries)):
+            response = self.client.post(reverse('time-bulk'), body[10:], format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([time['class'] for time in response.data], class_ids[10:60])
+
+    def test_invalid_items(self):
+        body = [{'title': 'Task'}, {'priority': 1}, {'title': 'Task', 'class': 0}]
+        response = self.client.post(reverse('task-bulk'), body, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data[0], {})
+        self.assertEqual(set(response.data[1]), {'title'})
+        self.assertEqual(set(response.data[2]), {'class'})
+        self.assertFalse(models.Task.objects.exists())
+        for body in ({'title': 'Task'}, []):
+            response = self.client.post(reverse('task-bulk'), body, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_update(self):
+        tasks = [models.Task.objects.create(title=f'Task {i}', owner=self.user) for i in range(3)]
+        other_task = models.Task.objects.create(title='Other task', owner=self.other_user)
+        body = [{'id': task.id, 'is_completed': True} for task in tasks[:2]]
+        response = self.client.patch(reverse('task-bulk'), body, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([task['title'] for task in response.data], ['Task 0', 'Task 1'])
+        self.assertEqual([task.is_completed for task in models.Task.objects.filter(owner=self.user).order_by('id')],
+                         [True, True, False])
+        self.assertGreater(models.Task.objects.get(id=tasks[0].id).version, tasks[2].version)
+        body = [{'id': tasks[2].id, 'title': 'Renamed'}, {'id': other_task.id, 'title': 'Renamed'},
+                {'id': tasks[2].id, 'title': 'Renamed'}, {'title': 'Renamed'}]
+        response = self.client.patch(reverse('task-bulk'), body, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, [{}, {'id': ['Not found.']}, {'id': ['Duplicate.']}, {'id': ['Not found.']}])
+        self.assertFalse(models.Task.objects.filter(title='Renamed').exists())
+
+    def test_delete(self):
+        self.create_classes(3)
+        class_ids = list(models.Class.objects.values_list('id', flat=True))
+        response = self.client.delete(reverse('class-bulk'), class_ids[:2], format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [{'id': id, 'deleted': True} for id in class_ids[:2]])
+        self.assertEqual(list(models.Class.objects.values_list('id', flat=True)), class_ids[2:])
+        self.assertEqual(set(models.Tombstone.objects.values_list('object_id', flat=True)), set(class_ids[:2]))
+        response = self.client.delete(reverse('class-bulk'), [class_ids[2], 'junk'], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertTrue(models.Class.objects.exists())
+
+    def test_times_are_materialized(self):
+        with mock.patch('schedule_server.materialization.timezone.localdate', return_value=date(2020, 1, 15)):
+            materialization.rebuild_window(self.user.id)
+            self.create_classes(2)
+            class_ids = list(models.Class.objects.values_list('id', flat=True))
+            body = [{'class': class_id, 'period': 7, 'days_of_week': str(i + 1), 'date_start': '2020-01-01',
+                     'date_end': '2020-01-31', 'time_start': '10:00', 'time_end': '11:00'}
+                    for i, class_id in enumerate(class_ids)]
+            time_ids = [time['id'] for time in self.client.post(reverse('time-bulk'), body, format='json').data]
+            self.assertEqual(models.Occurrence.objects.count(), 8)
+            self.client.patch(reverse('time-bulk'), [{'id': time_ids[0], 'date_end': '2020-01-15'}], format='json')
+            self.assertEqual(models.Occurrence.objects.count(), 6)
+            self.client.delete(reverse('time-bulk'), time_ids, format='json')
+            self.assertFalse(models.Occurrence.objects.exists())
+
+
+class CalendarFeedTests(APITestCase):
+    client_class = OnCommitAPIClient
+
+    def setUp(self):
+        caching.get_cache().clear()
+        self.user_credentials = dict(username='user', password='user')
+        self.user = User.objects.create_user(**self.user_credentials)
+        self.client.login(**self.user_credentials)
+        subject = models.Subject.objects.create(title='Maths, algebra; linear', color='000000', owner=self.user)
+        class_type = models.ClassType.objects.create(title='Lecture', owner=self.user)
+        teacher = models.Teacher.objects.create(name='Teacher', owner=self.user)
+        self.class_ = models.Class.objects.create(subject=subject, type=class_type, teacher=teacher, location='Room 1',
+                                                  owner=self.user)
+
+    def create_time(self, **kwargs):
+        kwargs = {'date_start': date(2020, 1, 1), 'time_start': '10:00', 'time_end': '11:30', **kwargs}
+        return models.Time.objects.create(**{'class': self.class_}, owner=self.user, **kwargs)
+
+    def get_events(self, **headers):
+        response = self.client.get(reverse(views.calendar_feed), **headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/calendar; charset=utf-8')
+        content = b''.join(response.streaming_content).decode()
+        self.assertTrue(all(len(line.encode()) <= 75 for line in content.split('\r\n')))
+        lines = content.replace('\r\n ', '').split('\r\n')
+        self.assertEqual((lines[0], lines[-2:]), ('BEGIN:VCALENDAR', ['END:VCALENDAR', '']))
+        events = []
+        for line in lines:
+            if line == 'BEGIN:VEVENT':
+                events.append({})
+            elif events and ':' in line and line != 'END:VEVENT':
+                name, value = line.split(':', 1)
+                events[-1][name] = value
+        return events
+
+    def test_weekly(self):
+        time = self.create_time(period=7, days_of_week='1,3', date_end=date(2020, 1, 31))
+        [event] = self.get_events()
+        self.assertEqual(event['UID'], f'time-{time.id}@testserver')
+        self.assertEqual((event['DTSTART'], event['DTEND']), ('20200101T100000', '20200101T113000'))
+        self.assertEqual(event['RRULE'], 'FREQ=WEEKLY;INTERVAL=1;WKST=MO;BYDAY=MO,WE;UNTIL=20200131T100000')
+        self.assertEqual(event['SUMMARY'], 'Maths\\, algebra\\; linear')
+        self.assertEqual(event['LOCATION'], 'Room 1')
+        self.assertEqual(event['DESCRIPTION'], 'Lecture\\nTeacher')
+
+    def test_recurrences(self):
+        self.create_time(period=14, date_start=date(2020, 1, 6))
+        self.create_time(period=10, days_of_week='5')
+        self.create_time(period=2, days_of_week='5')
+        self.create_time()
+        self.create_time(days_of_week='1')  # a Wednesday that is not a Monday never occurs
+        events = self.get_events()
+        self.assertEqual([(event['DTSTART'], event.get('RRULE')) for event in events], [
+            ('20200106T100000', 'FREQ=WEEKLY;INTERVAL=2;WKST=MO;BYDAY=MO,TU,WE,TH,FR,SA,SU'),
+            ('20200103T100000', 'FREQ=WEEKLY;INTERVAL=10;WKST=MO;BYDAY=FR'),
+            ('20200103T100000', 'FREQ=DAILY;INTERVAL=2;BYDAY=FR'),
+            ('20200101T100000', None),
+        ])
+
+    def test_first_occurrences_match_schedule(self):
+        times = [self.create_time(period=period, days_of_week=days_of_week, date_start=date(2020, 1, day))
+                 for period in (1, 3, 7, 9, 21) for days_of_week in (None, '2', '6,7') for day in (1, 4)]
+        starts = [event['DTSTART'] for event in self.get_events()]
+        expected = [occurances.get_time_occurrences(time, date(2020, 1, 1), date(2021, 1, 1))[0] for time in times]
+        self.assertEqual(starts, [f'{day:%Y%m%d}T100000' for day in expected])
+
+    def test_long_lines_are_folded(self):
+        self.class_.location = 'Аудитория ' * 20
+        self.class_.save()
+        self.create_time()
+        [event] = self.get_events()
+        self.assertEqual(event['LOCATION'], 'Аудитория ' * 20)
+
+    def test_conditional_get(self):
+        time = self.create_time(period=7)
+        url = reverse(views.calendar_feed)
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(2):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.client.patch(reverse('time-detail', args=[time.id]), {'time_start': '09:00:00'})
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_requires_authentication(self):
+        self.client.logout()
+        response = self.client.get(reverse(views.calendar_feed))
+        self.assertIn(response.status_code, (status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN))
+
+
+class ConflictTests(APITestCase):
+    client_class = OnCommitAPIClient
+
+    def setUp(self):
+        caching.get_cache().clear()
+        self.user = User.objects.create_user(username='user', password='user')
+        self.client.login(username='user', password='user')
+        subject = models.Subject.objects.create(title='Subject', color='000000', owner=self.user)
+        self.class_ = models.Class.objects.create(subject=subject, owner=self.user)
+        self.time = self.create_time(period=7, days_of_week='1,3', date_end=date(2020, 6, 30))
+
+    def create_time(self, **kwargs):
+        kwargs = {'date_start': date(2020, 1, 1), 'time_start': '10:00', 'time_end': '11:30', **kwargs}
+        return models.Time.objects.create(**{'class': self.class_}, owner=self.user, **kwargs)
+
+    def post(self, query='', **data):
+        data = {'class': self.class_.id, 'date_start': '2020-01-01', 'time_start': '11:00', 'time_end': '12:00',
+                **data}
+        return self.client.post(reverse('time-list') + query, data, format='json')
+
+    def test_create(self):
+        response = self.post(period=7, days_of_week='3')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['conflicts'], [{'id': self.time.id, 'date': date(2020, 1, 1)}])
+        self.assertEqual(models.Time.objects.count(), 1)
+        self.assertEqual(self.post(period=7, days_of_week='2', date_end='2020-06-30').status_code,
+                         status.HTTP_201_CREATED)
+        self.assertEqual(self.post(period=7, days_of_week='3', time_start='11:30', date_end='2020-06-30').status_code,
+                         status.HTTP_201_CREATED)
+        self.assertEqual(self.post(date_start='2020-07-01', period=1).status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.post('?allow_conflicts=1', period=7).status_code, status.HTTP_201_CREATED)
+
+    def test_alternating_weeks(self):
+        self.time.period = 14
+        self.time.save()
+        self.assertEqual(self.post(period=14, days_of_week='1', date_start='2020-01-08').status_code,
+                         status.HTTP_201_CREATED)
+        response = self.post(period=7, days_of_week='1', date_start='2020-01-08')
+        self.assertEqual(response.data['conflicts'], [{'id': self.time.id, 'date': date(2020, 1, 13)},
+                                                      {'id': self.time.id + 1, 'date': date(2020, 1, 20)}])
+
+    def test_update(self):
+        other = self.create_time(period=7, days_of_week='2')
+        version = caching.get_version('time', self.user.id)
+        response = self.client.patch(reverse('time-detail', args=[other.id]), {'days_of_week': '2,3'})
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        other.refresh_from_db()
+        self.assertEqual(other.days_of_week, '2')
+        # the rolled back write keeps cached responses
+        self.assertEqual(caching.get_version('time', self.user.id), version)
+        self.client.patch(reverse('time-detail', args=[other.id]), {'days_of_week': '2,4'})
+        self.assertNotEqual(caching.get_version('time', self.user.id), version)
+
+    def test_window(self):
+        later = self.create_time(period=7, days_of_week='5', date_start=date(2022, 6, 3), date_end=date(2022, 6, 30))
+        response = self.post(period=7, days_of_week='5', date_end='2023-12-31')
+        self.assertEqual(response.data['conflicts'], [{'id': later.id, 'date': date(2022, 6, 3)}])
+        # far future times end at the last date there is
+        self.assertEqual(self.post(period=7, date_start='9999-12-01').status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.post(period=1, date_start='9999-12-01', time_start='23:00', time_end='01:00').status_code,
+                         status.HTTP_201_CREATED)
+        response = self.post(period=7, days_of_week='3', date_start='9999-12-01', time_start='00:30')
+        self.assertEqual(response.data['conflicts'], [{'id': later.id + 1, 'date': date(9999, 12, 1)},
+                                                      {'id': later.id + 2, 'date': date(9999, 12, 8)}])
+
+    def test_bulk(self):
+        body = [{'class': self.class_.id, 'period': 7, 'days_of_week': days, 'date_start': '2020-01-01',
+                 'time_start': '11:00', 'time_end': '12:00'} for days in ('2', '3', '2')]
+        response = self.client.post(reverse('time-bulk'), body, format='json')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['conflicts'], [[{'item': 2, 'date': date(2020, 1, 7)}],
+                                                      [{'id': self.time.id, 'date': date(2020, 1, 1)}],
+                                                      [{'item': 0, 'date': date(2020, 1, 7)}]])
+        self.assertEqual(models.Time.objects.count(), 1)
+        response = self.client.post(reverse('time-bulk'), body[:1], format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        other = response.data[0]['id']
+        response = self.client.patch(reverse('time-bulk'), [{'id': other, 'days_of_week': '1'}], format='json')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['conflicts'], [[{'id': self.time.id, 'date': date(2020, 1, 6)}]])
+        self.assertEqual(models.Time.objects.get(pk=other).days_of_week, '2')
+        response = self.client.post(reverse('time-bulk') + '?allow_conflicts=1', body[1:], format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_past_midnight(self):
+        self.create_time(period=1, date_start=date(2020, 1, 5), time_start='23:00', time_end='10:30',
+                         date_end=date(2020, 1, 5))
+        response = self.client.get(reverse(views.time_conflicts), {'from': '2020-01-01', 'to': '2020-01-31'})
+        self.assertEqual(response.data, [{'times': [self.time.id, self.time.id + 1], 'date': date(2020, 1, 6)}])
+
+    def test_list(self):
+        overlapping = self.create_time(period=14, days_of_week='3', date_start=date(2020, 1, 8), time_start='11:00')
+        response = self.client.get(reverse(views.time_conflicts), {'from': '2020-01-01', 'to': '2020-12-31'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [{'times': [self.time.id, overlapping.id], 'date': date(2020, 1, 8)}])
+        self.assertEqual(self.client.get(reverse(views.time_conflicts), {'from': '2020-07-01'}).data, [])
+        for params in ({'from': '2020-02-01', 'to': '2020-01-01'}, {'from': '2020-01-01', 'to': '2021-06-01'},
+                       {'from': 'junk'}):
+            response = self.client.get(reverse(views.time_conflicts), params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_check(self):
+        data = {'class': self.class_.id, 'date_start': '2020-03-01', 'time_start': '09:00', 'time_end': '10:01'}
+        response = self.client.post(reverse(views.time_conflicts), data, format='json')
+        self.assertEqual(response.data, [])
+        response = self.client.post(reverse(views.time_conflicts), dict(data, date_start='2020-03-02'), format='json')
+        self.assertEqual(response.data, [{'id': self.time.id, 'date': date(2020, 3, 2)}])
+        self.assertEqual(models.Time.objects.count(), 1)
+
+    def test_same_as_pairwise(self):
+        rng = random.Random(0)
+
+        def random_time():
+            return datetime(2020, 1, 1, rng.randrange(24), rng.choice([0, 30])).time()
+
+        times = [models.Time(period=rng.choice([None, 1, 2, 7, 10, 14]), date_start=date(2020, 1, rng.randint(1, 28)),
+                             date_end=rng.choice([None, date(2020, 3, 1)]),
+                             weekdays=rng.choice([None, rng.randrange(1, 128)]),
+                             time_start=random_time(), time_end=random_time())
+                 for _ in range(60)]
+        date_from, date_to = date(2020, 1, 1), date(2020, 4, 30)
+        intervals = [[conflicts.get_interval(day, time)
+                      for day in occurances.get_time_occurrences(time, date_from, date_to)] for time in times]
+        expected = {}
+        for first in range(len(times)):
+            for second in range(first + 1, len(times)):
+                overlaps = [max(start, other_start).date() for start, end in intervals[first]
+                            for other_start, other_end in intervals[second] if start < other_end and other_start < end]
+                if overlaps:
+                    expected[first, second] = min(overlaps)
+        self.assertTrue(expected)
+        self.assertEqual(conflicts.find_conflicts(times, date_from, date_to), expected)
+        for index, time in enumerate(times):
+            others = times[:index] + times[index + 1:]
+            self.assertEqual(
+                {times.index(others[other]): day for other, day in
+                 conflicts.find_collisions(time, others, date_from, date_to).items()},
+                {pair[0] + pair[1] - index: day for pair, day in expected.items() if index in pair})
+
+
+class FreeSlotTests(APITestCase):
+
+    def setUp(self):
+        caching.get_cache().clear()
+        self.user = User.objects.create_user(username='user', password='user')
+        self.client.login(username='user', password='user')
+        subject = models.Subject.objects.create(title='Subject', color='000000', owner=self.user)
+        self.class_ = models.Class.objects.create(subject=subject, owner=self.user)
+        # mondays from 2020-01-06, overlapping from 11:00 to 11:30, and a night ending on the first of them
+        self.create_time(period=7, days_of_week='1', time_start='10:00', time_end='11:30')
+        self.create_time(period=7, days_of_week='1', time_start='11:00', time_end='12:00')
+        self.create_time(period=7, days_of_week='1', time_start='13:00', time_end='13:20')
+        self.create_time(date_start=date(2020, 1, 5), time_start='21:00', time_end='09:00')
+
+    def create_time(self, **kwargs):
+        kwargs = {'date_start': date(2020, 1, 1), 'date_end': date(2020, 12, 31), **kwargs}
+        return models.Time.objects.create(**{'class': self.class_}, owner=self.user, **kwargs)
+
+    def get_slots(self, **params):
+        response = self.client.get(reverse(views.free_slots), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [(str(slot['date']), slot['time_start'].isoformat('minutes'), slot['time_end'].isoformat('minutes'),
+                 slot['minutes']) for slot in response.data]
+
+    def test_gaps(self):
+        self.assertEqual(self.get_slots(**{'from': '2020-01-05', 'to': '2020-01-07'}), [
+            ('2020-01-05', '08:00', '21:00', 780),
+            ('2020-01-06', '09:00', '10:00', 60),
+            ('2020-01-06', '12:00', '13:00', 60),
+            ('2020-01-06', '13:20', '22:00', 520),
+            ('2020-01-07', '08:00', '22:00', 840),
+        ])
+
+    def test_parameters(self):
+        self.assertEqual(self.get_slots(**{'from': '2020-01-06', 'to': '2020-01-06', 'min_minutes': '61',
+                                           'day_start': '07:00', 'day_end': '12:30'}), [])
+        self.assertEqual(self.get_slots(**{'from': '2020-01-13', 'to': '2020-01-13', 'day_start': '11:45'}), [
+            ('2020-01-13', '12:00', '13:00', 60),
+            ('2020-01-13', '13:20', '22:00', 520),
+        ])
+        for params in ({'from': '2020-01-01'}, {'from': '2020-01-02', 'to': '2020-01-01'},
+                       {'from': '2020-01-01', 'to': '2021-06-01'}, {'from': '2020-01-01', 'to': '2020-01-02',
+                                                                    'day_start': '18:00', 'day_end': '09:00'},
+                       {'from': '2020-01-01', 'to': '2020-01-02', 'min_minutes': '0'},
+                       {'from': '2020-01-01', 'to': '2020-01-02', 'day_start': 'noon'}):
+            response = self.client.get(reverse(views.free_slots), params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_materialized(self):
+        params = {'from': '2020-01-01', 'to': '2020-06-30', 'min_minutes': '15'}
+        expected = self.get_slots(**params)
+        self.assertEqual(len(expected), 182 + 26 * 2)  # every date, and two more on mondays
+        with mock.patch('schedule_server.materialization.timezone.localdate', return_value=date(2020, 1, 15)):
+            materialization.rebuild_window(self.user.id)
+            caching.get_cache().clear()
+            with self.assertNumQueries(4):
+                self.assertEqual(self.get_slots(**params), expected)
+
+
+class SyncTests(APITestCase):
+
+    def setUp(self):
+        self.user_credentials = dict(username='user', password='user')
+        self.user = User.objects.create_user(**self.user_credentials)
+        self.other_user = User.objects.create_user(username='other', password='other')
+        self.client.login(**self.user_credentials)
+        self.subject = models.Subject.objects.create(title='Subject', color='000000', owner=self.user)
+        self.class_type = models.ClassType.objects.create(title='Class type', owner=self.user)
+        self.class_ = models.Class.objects.create(subject=self.subject, type=self.class_type, owner=self.user)
+        models.Subject.objects.create(title='Other subject', color='000000', owner=self.other_user)
+
+    def sync(self, since=None, **params):
+        if since is not None:
+            params['since'] = since
+        response = self.client.get(reverse(views.sync_changes), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def get_changes(self, since):
+        return [(change['resource'], change['id'], change['deleted']) for change in self.sync(since)['changes']]
+
+    def test_initial_sync(self):
+        page = self.sync()
+        self.assertEqual([(change['resource'], change['id']) for change in page['changes']],
+                         [('subjects', self.subject.id), ('class_types', self.class_type.id),
+                          ('classes', self.class_.id)])
+        self.assertEqual(page['changes'][2]['data'], serializers.ClassSerializer(self.class_).data)
+        self.assertEqual(page['cursor'], page['changes'][-1]['version'])
+        self.assertFalse(page['has_more'])
+        self.assertEqual(self.sync(page['cursor']), {'changes': [], 'cursor': page['cursor'], 'has_more': False})
+
+    def test_updates(self):
+        cursor = self.sync()['cursor']
+        self.client.patch(reverse('subject-detail', args=[self.subject.id]), {'color': 'ff0000'})
+        self.client.post(reverse('task-list'), {'title': 'Task'})
+        task = models.Task.objects.get()
+        self.assertEqual(self.get_changes(cursor), [('subjects', self.subject.id, False), ('tasks', task.id, False)])
+        self.client.patch(reverse('subject-detail', args=[self.subject.id]), {'color': '00ff00'})
+        self.assertEqual(self.get_changes(cursor), [('tasks', task.id, False), ('subjects', self.subject.id, False)])
+
+    def test_deletes(self):
+        time = models.Time.objects.create(**{'class': self.class_}, period=7, date_start='2020-01-01',
+                                          time_start='10:00', time_end='11:00', owner=self.user)
+        teacher = models.Teacher.objects.create(name='Teacher', owner=self.user)
+        self.class_.teacher = teacher
+        self.class_.save()
+        cursor = self.sync()['cursor']
+        self.client.delete(reverse('teacher-detail', args=[teacher.id]))
+        self.assertEqual(self.get_changes(cursor), [('classes', self.class_.id, False),
+                                                    ('teachers', teacher.id, True)])
+        self.client.delete(reverse('subject-detail', args=[self.subject.id]))
+        self.assertEqual(sorted(self.get_changes(cursor)), [
+            ('classes', self.class_.id, True), ('subjects', self.subject.id, True),
+            ('teachers', teacher.id, True), ('times', time.id, True)])
+
+    @mock.patch.object(models, 'TOUCH_BATCH_SIZE', 2)
+    def test_deletes_stamp_classes_in_batches(self):
+        for i in range(4):
+            models.Class.objects.create(subject=self.subject, type=self.class_type, owner=self.user)
+        cursor = self.sync()['cursor']
+        with CaptureQueriesContext(connection) as queries:
+            self.client.delete(reverse('class-type-detail', args=[self.class_type.id]))
+        stamps = [query for query in queries
+                  if query['sql'].startswith('UPDATE "schedule_server_class" SET "updated"')]
+        self.assertEqual(len(stamps), 3)
+        versions = sorted(models.Class.objects.values_list('version', flat=True))
+        self.assertEqual(versions, list(range(cursor + 1, cursor + 6)))
+        self.assertEqual([change[0] for change in self.get_changes(cursor)], ['classes'] * 5 + ['class_types'])
+
+    def test_versions_per_user(self):
+        self.assertEqual([self.subject.version, self.class_type.version, self.class_.version], [1, 2, 3])
+        self.assertEqual(models.Subject.objects.get(owner=self.other_user).version, 1)
+        models.Task.objects.create(title='Task', owner=self.other_user)
+        self.assertEqual(self.get_changes(self.class_.version), [])
+
+    def test_paging(self):
+        for i in range(5):
+            models.Task.objects.create(title=f'Task {i}', owner=self.user)
+        changes = self.sync()['changes']
+        cursor, paged = 0, []
+        while True:
+            page = self.sync(cursor, limit=3)
+            paged.extend(page['changes'])
+            cursor = page['cursor']
+            if not page['has_more']:
+                break
+        self.assertEqual(paged, changes)
+        self.assertEqual(len(changes), 8)
+
+    def test_invalid_parameters(self):
+        for params in ({'since': 'junk'}, {'since': -1}, {'limit': 0}, {'limit': 1001}):
+            response = self.client.get(reverse(views.sync_changes), params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
 
 class TaskTests(APITestCase):
 
@@ -534,7 +1802,40 @@ class TaskTests(APITestCase):
         tasks = [serializers.TaskSerializer().to_representation(task) for task in tasks]
         tasks = sorted(tasks, key=itemgetter('due_date'), reverse=True)
         response = self.client.get(reverse('task-list'))
-        self.assertEqual(response.data, tasks)
+        self.assertEqual(response.data['results'], tasks)
+
+    def test_dates(self):
+        response = self.client.post(reverse('task-list'), {'title': 'Task', 'due_date': 'tomorrow'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(reverse('task-list'), {'title': 'Task', 'due_date': '2020-01-01',
+                                                           'completed_at': '2020-01-01T12:30:00+03:00'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        task = models.Task.objects.get(id=response.data['id'])
+        self.assertEqual((task.due_date, task.completed_at),
+                         (date(2020, 1, 1), datetime(2020, 1, 1, 9, 30, tzinfo=timezone.utc)))
+
+    def test_agenda(self):
+        """FR_Id_26
+        Issues are displayed grouped by date and sorted by priority.
+        """
+        tasks = [models.Task.objects.create(title=f'Task {i}', due_date=due_date, priority=priority,
+                                            is_completed=is_completed, owner=self.user)
+                 for i, (due_date, priority, is_completed) in enumerate([
+                     ('2020-01-02', 1, False), ('2020-01-01', 0, False), ('2020-01-02', 3, False),
+                     ('2020-01-02', 2, True), (None, 3, False), ('2020-01-03', 0, False)])]
+        models.Task.objects.create(title='Other task', due_date='2020-01-02', owner=self.superuser)
+
+        def get_agenda(**params):
+            response = self.client.get(reverse('task-agenda'), params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return [(str(group['date']), [task['id'] for task in group['tasks']]) for group in response.data]
+
+        self.assertEqual(get_agenda(), [('2020-01-01', [tasks[1].id]), ('2020-01-02', [tasks[2].id, tasks[0].id]),
+                                        ('2020-01-03', [tasks[5].id])])
+        self.assertEqual(get_agenda(**{'from': '2020-01-02', 'to': '2020-01-02', 'include_completed': '1'}),
+                         [('2020-01-02', [tasks[2].id, tasks[3].id, tasks[0].id])])
+        response = self.client.get(reverse('task-agenda'), {'from': '2020-01-32'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
     def test_privileges(self):
         admin_task = models.Task(title='Admin task', owner=self.superuser)
@@ -544,13 +1845,13 @@ class TaskTests(APITestCase):
         self.client.login(**self.superuser_credentials)
         response = self.client.get(reverse('task-list'))
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, [
+        self.assertEqual(response.data['results'], [
             serializers.TaskSerializer().to_representation(admin_task),
             serializers.TaskSerializer().to_representation(regular_task)
         ])
         self.client.login(**self.user_credentials)
         response = self.client.get(reverse('task-list'))
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, [
+        self.assertEqual(response.data['results'], [
             serializers.TaskSerializer().to_representation(regular_task)
         ])
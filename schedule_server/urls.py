@@ -33,4 +33,10 @@ urlpatterns = [
     path('', include(router.urls)),
     path('api-auth/', include('rest_framework.urls', namespace='rest_framework')),
     path('schedule/<str:date>/', views.schedule),
+    path('schedule/<str:start>/<str:end>/', views.schedule_range),
+    path('day/<str:date>/', views.day),
+    path('sync/', views.sync_changes),
+    path('calendar.ics', views.calendar_feed),
+    path('conflicts/', views.time_conflicts),
+    path('free-slots/', views.free_slots),
 ]
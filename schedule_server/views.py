@@ -1,21 +1,65 @@
 import datetime
+from itertools import groupby
 
 from django.contrib.auth.models import User
-from django.db.models import Q
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Prefetch, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.db.models.deletion import Collector
+from django.http import StreamingHttpResponse
+from django.utils.http import parse_etags
 from rest_framework import viewsets, permissions, status
-from rest_framework.decorators import api_view
+from rest_framework.decorators import action, api_view, permission_classes, renderer_classes
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 
-from schedule_server import models, serializers
-from schedule_server.occurances import is_occurrence
+from schedule_server import caching, conflicts, export, free_time, ical, materialization, models, serializers, sync
+from schedule_server.occurances import get_time_occurrences, occurrence_mask
 from schedule_server.permissions import IsOwnerOrAdmin
 from schedule_server.serializers import UserSerializer
 
 
+def count_owned(model):
+    """The number of objects of `model` each user owns, to annotate users with."""
+    counts = model.objects.filter(owner=OuterRef('pk')).order_by().values('owner').annotate(count=Count('pk'))
+    return Coalesce(Subquery(counts.values('count')), 0)
+
+
 class UserViewSet(viewsets.ModelViewSet):
+    """
+    Users with the ids of the objects they own, prefetched with a query per collection for
+    a whole page. `?collections=counts` gives the number of objects instead and `?collections=none`
+    omits the collections.
+    """
     queryset = User.objects.all()
     serializer_class = UserSerializer
 
+    def get_collections(self):
+        if self.request.method not in permissions.SAFE_METHODS:
+            return UserSerializer.IDS
+        collections = self.request.query_params.get('collections', UserSerializer.IDS)
+        if collections not in (UserSerializer.IDS, UserSerializer.COUNTS, UserSerializer.NONE):
+            raise ValidationError({'collections': ['Expected ids, counts or none.']})
+        return collections
+
+    def get_queryset(self):
+        collections = self.get_collections()
+        queryset = super().get_queryset()
+        if collections == UserSerializer.IDS:
+            return queryset.prefetch_related(*[
+                Prefetch(models.get_resource(model), queryset=model.objects.only('id', 'owner'))
+                for model in models.SYNCED_MODELS])
+        if collections == UserSerializer.COUNTS:
+            return queryset.annotate(**{f'{models.get_resource(model)}_count': count_owned(model)
+                                        for model in models.SYNCED_MODELS})
+        return queryset
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['collections'] = self.get_collections()
+        return context
+
     class IsThisUserOrAdmin(permissions.BasePermission):
         def has_object_permission(self, request, view, obj):
             return bool(request.user) and (request.user.is_staff or obj.id == request.user.id)
@@ -39,61 +83,211 @@ class UserViewSet(viewsets.ModelViewSet):
 #     permission_classes = [permissions.IsAdminUser]
 
 
-class SubjectViewSet(viewsets.ModelViewSet):
+def get_conditional_response(request, etag, get_response):
+    """A 304 response if the client already has `etag`, otherwise the response `get_response` makes."""
+    if_none_match = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+    if etag in if_none_match or '*' in if_none_match:
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = get_response()
+    if response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+        response['ETag'] = etag
+    return response
+
+
+MAX_BULK_ITEMS = 1000
+
+
+class OwnedModelViewSet(viewsets.ModelViewSet):
+    """
+    Objects owned by users. Created objects are owned by the requesting user, writes bump
+    the owner's version of `resource`, and reads are conditional on ETags of that version.
+    """
+    resource = None
+    related_fields = ['owner']
+
+    def filter_queryset(self, queryset):
+        return super().filter_queryset(queryset).select_related(*self.related_fields)
+
+    def get_etag(self, owner_id):
+        version = caching.get_version(self.resource, owner_id)
+        return caching.get_etag(self.request.user.id, version, self.request.accepted_renderer.format,
+                                self.request.get_full_path())
+
+    def list(self, request, *args, **kwargs):
+        owner_id = caching.ALL_USERS if request.user.is_staff else request.user.id
+        return get_conditional_response(request, self.get_etag(owner_id),
+                                        lambda: super(OwnedModelViewSet, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        return get_conditional_response(request, self.get_etag(instance.owner_id),
+                                        lambda: Response(self.get_serializer(instance).data))
+
+    def perform_create(self, serializer):
+        self.invalidate(serializer.save(owner=self.request.user))
+
+    def perform_update(self, serializer):
+        self.invalidate(serializer.save())
+
+    def perform_destroy(self, instance):
+        instance.delete()
+        self.invalidate(instance)
+
+    def invalidate(self, *instances):
+        for owner_id in {instance.owner_id for instance in instances}:
+            caching.bump_version(self.resource, owner_id)
+
+    @action(detail=False)
+    def export(self, request, *args, **kwargs):
+        """
+        Every object the user may list as one JSON array, or one object per line with `?ndjson=1`,
+        streamed as the rows are read rather than paginated.
+        """
+        lines = request.query_params.get('ndjson') == '1'
+        queryset = self.filter_queryset(self.get_queryset())
+        return StreamingHttpResponse(export.stream(queryset, self.get_serializer().to_representation, lines),
+                                     content_type='application/x-ndjson' if lines else 'application/json')
+
+    @action(detail=False, methods=['post', 'patch', 'delete'])
+    def bulk(self, request, *args, **kwargs):
+        """
+        Creates, partially updates or deletes a list of objects in one transaction. Updates list objects
+        with their ids and deletes list ids. Nothing is written unless every item is valid, and results
+        or errors are listed in the order of the items.
+        """
+        if not isinstance(request.data, list) or not 0 < len(request.data) <= MAX_BULK_ITEMS:
+            return Response({'detail': f'Expected a list of 1 to {MAX_BULK_ITEMS} items.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if request.method == 'POST':
+            return self.bulk_create(request.data)
+        if request.method == 'PATCH':
+            return self.bulk_update(request.data)
+        return self.bulk_destroy(request.data)
+
+    def bulk_create(self, data):
+        serializer = self.get_serializer(data=data, many=True)
+        serializer.is_valid(raise_exception=True)
+        self.perform_bulk_create(serializer)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    def perform_bulk_create(self, serializer):
+        with transaction.atomic():
+            self.invalidate(*serializer.save(owner=self.request.user))
+
+    def bulk_update(self, data):
+        instances, errors = self.get_bulk_objects([item.get('id') if isinstance(item, dict) else None
+                                                   for item in data])
+        if any(errors):
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+        serializer = self.get_serializer(instances, data=data, many=True, partial=True)
+        serializer.is_valid(raise_exception=True)
+        self.perform_bulk_update(serializer)
+        return Response(serializer.data)
+
+    def perform_bulk_update(self, serializer):
+        with transaction.atomic():
+            self.invalidate(*serializer.save())
+
+    def bulk_destroy(self, ids):
+        instances, errors = self.get_bulk_objects(ids)
+        if any(errors):
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+        with transaction.atomic():
+            collector = Collector(using=self.get_queryset().db)
+            collector.collect(instances)
+            collector.delete()
+            self.invalidate(*instances)
+        return Response([{'id': id, 'deleted': True} for id in ids])
+
+    def get_bulk_objects(self, ids):
+        """The objects with `ids` the user may write, and an error for each id that is not one, or {}."""
+        found = self.get_queryset().select_related('owner').in_bulk([id for id in ids if type(id) is int])
+        instances, errors, seen = [], [], set()
+        for id in ids:
+            instance = found.get(id) if type(id) is int else None
+            if instance is None:
+                errors.append({'id': ['Not found.']})
+            elif id in seen:
+                errors.append({'id': ['Duplicate.']})
+            else:
+                self.check_object_permissions(self.request, instance)
+                errors.append({})
+                seen.add(id)
+            instances.append(instance)
+        return instances, errors
+
+
+class SubjectViewSet(OwnedModelViewSet):
     serializer_class = serializers.SubjectSerializer
     permission_classes = [IsOwnerOrAdmin]
+    resource = 'subject'
 
     def get_queryset(self):
         if self.request.user.is_staff:
             return models.Subject.objects.all()
         return self.request.user.subjects.all()
 
-    def perform_create(self, serializer):
-        serializer.save(owner=self.request.user)
-
 
-class TeacherViewSet(viewsets.ModelViewSet):
+class TeacherViewSet(OwnedModelViewSet):
     serializer_class = serializers.TeacherSerializer
     permission_classes = [IsOwnerOrAdmin]
+    resource = 'teacher'
 
     def get_queryset(self):
         if self.request.user.is_staff:
             return models.Teacher.objects.all()
         return self.request.user.teachers.all()
 
-    def perform_create(self, serializer):
-        serializer.save(owner=self.request.user)
-
 
-class ClassTypeViewSet(viewsets.ModelViewSet):
+class ClassTypeViewSet(OwnedModelViewSet):
     serializer_class = serializers.ClassTypeSerializer
     permission_classes = [IsOwnerOrAdmin]
+    resource = 'class-type'
 
     def get_queryset(self):
         if self.request.user.is_staff:
             return models.ClassType.objects.all()
         return self.request.user.class_types.all()
 
-    def perform_create(self, serializer):
-        serializer.save(owner=self.request.user)
-
 
-class ClassViewSet(viewsets.ModelViewSet):
+class ClassViewSet(OwnedModelViewSet):
     serializer_class = serializers.ClassSerializer
     permission_classes = [IsOwnerOrAdmin]
+    resource = 'class'
+    related_fields = ['owner', 'subject__owner', 'type__owner', 'teacher__owner']
 
     def get_queryset(self):
         if self.request.user.is_staff:
             return models.Class.objects.all()
         return self.request.user.classes.all()
 
-    def perform_create(self, serializer):
-        serializer.save(owner=self.request.user)
+    def invalidate(self, *instances):
+        # nested data of classes creates and updates subjects, class types and teachers
+        super().invalidate(*instances)
+        for owner_id in {instance.owner_id for instance in instances}:
+            for resource in ('subject', 'class-type', 'teacher'):
+                caching.bump_version(resource, owner_id)
+
+
+class Conflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'The time overlaps other times.'
+    default_code = 'conflict'
 
+    def __init__(self, conflicts):
+        super().__init__()
+        self.detail = {'detail': self.detail, 'conflicts': conflicts}
 
-class TimeViewSet(viewsets.ModelViewSet):
+
+class TimeViewSet(OwnedModelViewSet):
+    """
+    Times of classes. Creating or updating times, one or in bulk, that overlap other times of their owner
+    is a 409 Conflict listing them, unless `?allow_conflicts=1` is passed.
+    """
     serializer_class = serializers.TimeSerializer
     permission_classes = [IsOwnerOrAdmin]
+    resource = 'time'
 
     def get_queryset(self):
         if self.request.user.is_staff:
@@ -101,20 +295,87 @@ class TimeViewSet(viewsets.ModelViewSet):
         return self.request.user.times.all()
 
     def perform_create(self, serializer):
-        serializer.save(owner=self.request.user)
-
-
-class TaskViewSet(viewsets.ModelViewSet):
+        with transaction.atomic():
+            super().perform_create(serializer)
+            self.check_conflicts(serializer.instance)
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            super().perform_update(serializer)
+            self.check_conflicts(serializer.instance)
+
+    def perform_bulk_create(self, serializer):
+        with transaction.atomic():
+            super().perform_bulk_create(serializer)
+            self.check_bulk_conflicts(serializer.instance)
+
+    def perform_bulk_update(self, serializer):
+        with transaction.atomic():
+            super().perform_bulk_update(serializer)
+            self.check_bulk_conflicts(serializer.instance)
+
+    def allows_conflicts(self):
+        return self.request.query_params.get('allow_conflicts') == '1'
+
+    def check_conflicts(self, instance):
+        if self.allows_conflicts():
+            return
+        time_conflicts = conflicts.get_time_conflicts(instance)
+        if time_conflicts:
+            raise Conflict(time_conflicts)
+
+    def check_bulk_conflicts(self, instances):
+        """Conflicts of a bulk write list those of each item in its order, with other items by their index."""
+        if self.allows_conflicts():
+            return
+        batch_conflicts = conflicts.get_batch_conflicts(instances)
+        if any(batch_conflicts):
+            raise Conflict(batch_conflicts)
+
+    def invalidate(self, *instances):
+        # occurrences of deleted times are deleted with them
+        materialization.refresh_times([instance for instance in instances if instance.pk is not None])
+        super().invalidate(*instances)
+
+
+class TaskViewSet(OwnedModelViewSet):
     serializer_class = serializers.TaskSerializer
     permission_classes = [IsOwnerOrAdmin]
+    resource = 'task'
 
     def get_queryset(self):
         if self.request.user.is_staff:
             return models.Task.objects.all()
         return self.request.user.tasks.all()
 
-    def perform_create(self, serializer):
-        serializer.save(owner=self.request.user)
+    @action(detail=False)
+    def agenda(self, request, *args, **kwargs):
+        """
+        Tasks with due dates grouped by date in ascending order, the tasks of a date by descending priority.
+        `from` and `to` bound the dates, and completed tasks are left out unless `include_completed=1`.
+        """
+        try:
+            date_from = parse_date(request.query_params['from']) if 'from' in request.query_params else None
+            date_to = parse_date(request.query_params['to']) if 'to' in request.query_params else None
+        except ValueError:
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+        owner_id = caching.ALL_USERS if request.user.is_staff else request.user.id
+        return get_conditional_response(request, self.get_etag(owner_id), lambda: Response(
+            self.get_agenda(date_from, date_to, request.query_params.get('include_completed') == '1')))
+
+    def get_agenda(self, date_from, date_to, include_completed):
+        tasks = self.filter_queryset(self.get_queryset()).filter(due_date__isnull=False)
+        if not include_completed:
+            tasks = tasks.filter(is_completed=False)
+        if date_from is not None:
+            tasks = tasks.filter(due_date__gte=date_from)
+        if date_to is not None:
+            tasks = tasks.filter(due_date__lte=date_to)
+        # rows come ordered by date, so each date's tasks follow each other
+        tasks = list(tasks.order_by('due_date', '-priority', 'pk'))
+        data = self.get_serializer(tasks, many=True).data
+        return [{'date': date, 'tasks': [item for _, item in group]}
+                for date, group in groupby(zip(tasks, data), key=lambda pair: pair[0].due_date)]
 
 
 # val dateDOW = date.dayOfWeek
@@ -167,51 +428,256 @@ class TaskViewSet(viewsets.ModelViewSet):
 # )
 
 
+MAX_SCHEDULE_RANGE_DAYS = 366
+
+SCHEDULE_RELATED_FIELDS = ['owner', 'class__owner', 'class__subject__owner', 'class__type__owner',
+                           'class__teacher__owner']
+
+
+def parse_date(value):
+    year, month, day = value.split('-')
+    return datetime.date(int(year), int(month), int(day))
+
+
+CLASS_REPRESENTATION = serializers.compile_representation(serializers.ClassSerializer())
+
+TIME_REPRESENTATION = serializers.compile_representation(serializers.TimeSerializer(), ['time_start', 'time_end'])
+
+
+def build_schedule_item(class_data, time):
+    item = dict(class_data)
+    item.update(TIME_REPRESENTATION(time))
+    return item
+
+
+def get_materialized_times(user_id, date_from, date_to):
+    """
+    (date, time) pairs from the materialized occurrences, ordered by date and start time,
+    or None if the dates are not materialized.
+    """
+    if materialization.get_window(user_id, date_from, date_to) is None:
+        return None
+    occurrences = models.Occurrence.objects.filter(
+        owner_id=user_id, date__gte=date_from, date__lte=date_to
+    ).select_related(*['time__' + field for field in SCHEDULE_RELATED_FIELDS])
+    return [(occurrence.date, occurrence.time) for occurrence in occurrences]
+
+
+def get_schedule(user_id, date):
+    occurrences = get_materialized_times(user_id, date, date)
+    if occurrences is not None:
+        return [build_schedule_item(CLASS_REPRESENTATION(getattr(time, 'class')), time) for _, time in occurrences]
+
+    times = models.Time.objects.annotate(
+        on_weekday=F('weekdays').bitand(1 << date.weekday())
+    ).filter(
+        Q(owner_id=user_id),
+        Q(date_start__lte=date),
+        Q(date_end__gte=date) | Q(date_end__isnull=True),
+        Q(on_weekday__gt=0) | Q(weekdays__isnull=True)
+    ).select_related(*SCHEDULE_RELATED_FIELDS)
+    times = list(times)
+    mask = occurrence_mask([time.date_start.toordinal() for time in times],
+                           [time.period for time in times],
+                           [None] * len(times), date)
+    times = [time for time, is_occurring in zip(times, mask) if is_occurring]
+
+    # return db.rawQuery(
+    #     """
+    #     SELECT classes._id,
+    #     subjects.title AS subject,
+    #     colors.color AS color,
+    #     classTypes.title AS type,
+    #     times.timeStart, timeEnd,
+    #     location,
+    #     teachers.name AS teacher FROM classes
+    #     INNER JOIN subjects ON classes.subjectId = subjects._id
+    #     INNER JOIN colors ON subjects.colorId = colors._id
+    #     INNER JOIN times ON times.classId = classes._id
+    #     INNER JOIN classTypes ON classes.typeId = classTypes._id
+    #     LEFT JOIN teachers ON classes.teacherId = teachers._id
+    #     WHERE classes._id IN (${format(classIds)})
+    #     ORDER BY timeStart ASC""", null
+    # )
+
+    return [build_schedule_item(CLASS_REPRESENTATION(getattr(time, 'class')), time) for time in times]
+
+
+def get_schedule_range(user_id, date_from, date_to):
+    """
+    Schedule for every date from `date_from` to `date_to` inclusive, grouped by date.
+    Dates beyond the materialized horizon are expanded from the candidate times in one pass.
+    """
+    occurrences = get_materialized_times(user_id, date_from, date_to)
+    if occurrences is None:
+        times = models.Time.objects.filter(
+            Q(owner_id=user_id),
+            Q(date_start__lte=date_to),
+            Q(date_end__gte=date_from) | Q(date_end__isnull=True)
+        ).select_related(*SCHEDULE_RELATED_FIELDS)
+        occurrences = [(date, time) for time in times for date in get_time_occurrences(time, date_from, date_to)]
+        occurrences.sort(key=lambda occurrence: occurrence[0])
+
+    days = (date_to - date_from).days + 1
+    schedule = {(date_from + datetime.timedelta(i)).isoformat(): [] for i in range(days)}
+    classes = {}
+    for date, time in occurrences:
+        if time.class_id not in classes:
+            classes[time.class_id] = CLASS_REPRESENTATION(getattr(time, 'class'))
+        schedule[date.isoformat()].append(build_schedule_item(classes[time.class_id], time))
+    return schedule
+
+
+def get_conditional_schedule(request, key, compute, resource='schedule'):
+    version = caching.get_version(resource, request.user.id)
+    etag = caching.get_etag(request.user.id, version, request.accepted_renderer.format, request.get_full_path())
+    return get_conditional_response(
+        request, etag, lambda: Response(caching.get_or_set_schedule(request.user.id, version, key, compute)))
+
+
 @api_view(['GET'])
 def schedule(request, date, format=None):
     try:
-        year, month, day = date.split('-')
-        viewing_date = datetime.date(int(year), int(month), int(day))
+        viewing_date = parse_date(date)
     except ValueError:
         return Response(status=status.HTTP_400_BAD_REQUEST)
 
     if request.method == 'GET':
-        weekday = viewing_date.weekday() + 1
-        times = models.Time.objects.filter(
-            Q(owner_id=request.user.id),
-            Q(date_start__lte=viewing_date),
-            Q(date_end__gte=viewing_date) | Q(date_end__isnull=True),
-            Q(days_of_week__contains=weekday) | Q(days_of_week__isnull=True)
-        )
-        times = [time for time in times if is_occurrence(
-            viewing_date, time.date_start, datetime.timedelta(int(time.period)) if time.period else None)]
-
-        # return db.rawQuery(
-        #     """
-        #     SELECT classes._id,
-        #     subjects.title AS subject,
-        #     colors.color AS color,
-        #     classTypes.title AS type,
-        #     times.timeStart, timeEnd,
-        #     location,
-        #     teachers.name AS teacher FROM classes
-        #     INNER JOIN subjects ON classes.subjectId = subjects._id
-        #     INNER JOIN colors ON subjects.colorId = colors._id
-        #     INNER JOIN times ON times.classId = classes._id
-        #     INNER JOIN classTypes ON classes.typeId = classTypes._id
-        #     LEFT JOIN teachers ON classes.teacherId = teachers._id
-        #     WHERE classes._id IN (${format(classIds)})
-        #     ORDER BY timeStart ASC""", null
-        # )
-
-        response = []
-        for time in times:
-            class_ = models.Class.objects.get(id=time.class_id)
-            time = serializers.TimeSerializer(time).data
-            time.pop('class')
-
-            item = serializers.ClassSerializer(class_).data
-            item['time_start'] = time['time_start']
-            item['time_end'] = time['time_end']
-            response.append(item)
-        return Response(response)
+        return get_conditional_schedule(request, viewing_date.isoformat(),
+                                        lambda: get_schedule(request.user.id, viewing_date))
+
+
+def get_day(request, date):
+    """
+    The schedule of a date with the tasks due that date embedded in the items of their classes,
+    and the tasks of no class in the schedule besides them.
+    """
+    items = get_schedule(request.user.id, date)
+    tasks = models.Task.objects.filter(owner_id=request.user.id, due_date=date).order_by('-priority', 'pk')
+    tasks = serializers.TaskSerializer(tasks, many=True, context={'request': request}).data
+    tasks_by_class = {}
+    for task in tasks:
+        tasks_by_class.setdefault(task['class'], []).append(task)
+    for item in items:
+        item['tasks'] = tasks_by_class.get(item['id'], [])
+    class_ids = {item['id'] for item in items}
+    return {
+        'date': date.isoformat(),
+        'schedule': items,
+        'tasks': [task for task in tasks if task['class'] not in class_ids],
+    }
+
+
+@api_view(['GET'])
+def day(request, date, format=None):
+    """
+    The schedule of a date, each class with the requesting user's tasks for it due that date,
+    in one response for the day screen.
+    """
+    try:
+        viewing_date = parse_date(date)
+    except ValueError:
+        return Response(status=status.HTTP_400_BAD_REQUEST)
+
+    return get_conditional_schedule(request, f'day/{viewing_date.isoformat()}',
+                                    lambda: get_day(request, viewing_date), resource='day')
+
+
+@api_view(['GET'])
+def schedule_range(request, start, end, format=None):
+    """
+    Schedule for every date from `start` to `end` inclusive, grouped by date.
+    """
+    try:
+        date_from = parse_date(start)
+        date_to = parse_date(end)
+    except ValueError:
+        return Response(status=status.HTTP_400_BAD_REQUEST)
+    days = (date_to - date_from).days + 1
+    if days < 1 or days > MAX_SCHEDULE_RANGE_DAYS:
+        return Response(status=status.HTTP_400_BAD_REQUEST)
+
+    return get_conditional_schedule(request, f'{date_from.isoformat()}/{date_to.isoformat()}',
+                                    lambda: get_schedule_range(request.user.id, date_from, date_to))
+
+
+@api_view(['GET'])
+def free_slots(request, format=None):
+    """
+    Gaps of at least `min_minutes` between the requesting user's classes on every date from `from`
+    to `to` inclusive, within `day_start` and `day_end` of each date.
+    """
+    params = request.query_params
+    try:
+        date_from = parse_date(params['from'])
+        date_to = parse_date(params['to'])
+        day_start = datetime.time.fromisoformat(params.get('day_start', free_time.DAY_START.isoformat()))
+        day_end = datetime.time.fromisoformat(params.get('day_end', free_time.DAY_END.isoformat()))
+        min_minutes = int(params.get('min_minutes', free_time.MIN_MINUTES))
+    except (KeyError, ValueError):
+        return Response(status=status.HTTP_400_BAD_REQUEST)
+    days = (date_to - date_from).days + 1
+    if days < 1 or days > MAX_SCHEDULE_RANGE_DAYS or day_start >= day_end or min_minutes < 1:
+        return Response(status=status.HTTP_400_BAD_REQUEST)
+
+    key = f'free-slots/{date_from.isoformat()}/{date_to.isoformat()}/{day_start}/{day_end}/{min_minutes}'
+    return get_conditional_schedule(request, key, lambda: free_time.get_free_slots(
+        request.user.id, date_from, date_to, day_start, day_end, min_minutes))
+
+
+@api_view(['GET', 'POST'])
+def time_conflicts(request, format=None):
+    """
+    GET lists the pairs of the requesting user's times that overlap from `from` to `to`, today
+    and the year after it by default. POST checks a time the user has not created yet.
+    """
+    if request.method == 'POST':
+        serializer = serializers.TimeSerializer(data=request.data, context={'request': request})
+        serializer.is_valid(raise_exception=True)
+        time = models.Time(owner=request.user, **serializer.validated_data)
+        return Response(conflicts.get_time_conflicts(time))
+
+    try:
+        date_from = parse_date(request.query_params.get('from') or datetime.date.today().isoformat())
+        date_to = parse_date(request.query_params.get('to')
+                             or (date_from + datetime.timedelta(conflicts.HORIZON_DAYS - 1)).isoformat())
+    except ValueError:
+        return Response(status=status.HTTP_400_BAD_REQUEST)
+    days = (date_to - date_from).days + 1
+    if days < 1 or days > conflicts.HORIZON_DAYS:
+        return Response(status=status.HTTP_400_BAD_REQUEST)
+
+    return Response(conflicts.get_user_conflicts(request.user.id, date_from, date_to))
+
+
+@api_view(['GET'])
+@renderer_classes([ical.ICalendarRenderer, JSONRenderer])
+@permission_classes([permissions.IsAuthenticated])
+def calendar_feed(request, format=None):
+    """
+    The requesting user's times as an iCalendar feed with one recurring event per time,
+    for calendar apps to subscribe to. Conditional on the ETag of the schedule's version.
+    """
+    version = caching.get_version('schedule', request.user.id)
+    etag = caching.get_etag(request.user.id, version, ical.ICalendarRenderer.format, request.get_full_path())
+    times = models.Time.objects.filter(owner_id=request.user.id).select_related(
+        'class__subject', 'class__type', 'class__teacher').order_by('id')
+    return get_conditional_response(request, etag, lambda: StreamingHttpResponse(
+        ical.stream(times, request.get_host()), content_type='text/calendar; charset=utf-8'))
+
+
+@api_view(['GET'])
+def sync_changes(request, format=None):
+    """
+    Objects of the requesting user created, updated or deleted after the `since` cursor,
+    at most `limit` of them. Pass the returned cursor as `since` to get the next page.
+    """
+    try:
+        since = int(request.query_params.get('since', 0))
+        limit = int(request.query_params.get('limit', sync.DEFAULT_LIMIT))
+    except ValueError:
+        return Response(status=status.HTTP_400_BAD_REQUEST)
+    if since < 0 or limit < 1 or limit > sync.MAX_LIMIT:
+        return Response(status=status.HTTP_400_BAD_REQUEST)
+
+    return Response(sync.get_page(request.user.id, since, limit))